@@ -0,0 +1,186 @@
+"""Retention for TradingState: cold history moves to S3, the hot table stays small.
+
+Items older than ARCHIVE_AFTER_DAYS are written per symbol and UTC day as
+gzipped NDJSON in DynamoDB JSON, which keeps every Decimal exact, under
+
+    s3://ARCHIVE_BUCKET/ARCHIVE_PREFIX/symbol=<symbol>/date=<YYYY-MM-DD>/<first>-<last>.ndjson.gz
+
+Items are deleted from the table in bulk only after their object is
+written. A run cut short leaves at worst a few items both in S3 and in the
+table, and `read_history` drops those duplicates. `read_history` serves any
+time range from the table and the archive together.
+"""
+import datetime
+import gzip
+import json
+import os
+import time
+
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+from export import parallel_scan
+from handler import get_clients
+
+ARCHIVE_BUCKET = os.environ.get('ARCHIVE_BUCKET', 'tradingdatabucket')
+ARCHIVE_PREFIX = os.environ.get('ARCHIVE_PREFIX', 'archive')
+ARCHIVE_AFTER_DAYS = float(os.environ.get('ARCHIVE_AFTER_DAYS', '7'))
+LATEST_TABLE_NAME = os.environ.get('LATEST_TABLE_NAME', 'TradingStateLatest')
+TABLE_NAME = 'TradingState'
+
+DAY_MS = 24 * 60 * 60 * 1000
+# Stop starting new symbols when the invocation has less time than this left
+TIME_RESERVE_MS = 60 * 1000
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+def cutoff_timestamp(now=None):
+    now = int(time.time() * 1000) if now is None else now
+    return now - int(ARCHIVE_AFTER_DAYS * DAY_MS)
+
+
+def _date(timestamp):
+    return datetime.datetime.utcfromtimestamp(int(timestamp) // 1000).strftime('%Y-%m-%d')
+
+
+def _day_prefix(symbol, date):
+    return f"{ARCHIVE_PREFIX}/symbol={symbol}/date={date}/"
+
+
+def encode_items(items):
+    lines = (json.dumps({k: _serializer.serialize(v) for k, v in item.items()}, separators=(',', ':'))
+             for item in items)
+    return gzip.compress(('\n'.join(lines) + '\n').encode())
+
+
+def decode_items(body):
+    return [{k: _deserializer.deserialize(v) for k, v in json.loads(line).items()}
+            for line in gzip.decompress(body).decode().splitlines() if line]
+
+
+def list_symbols(history=True):
+    """Symbols with history, from the latest-state table and a key-only scan of the history.
+
+    The latest-state table alone misses symbols that stopped trading before
+    it existed, so the history is scanned too unless `history` is False.
+    """
+    dynamodb, _ = get_clients()
+    symbols = set()
+    tables = ([TABLE_NAME] if history or not LATEST_TABLE_NAME else []) + \
+        ([LATEST_TABLE_NAME] if LATEST_TABLE_NAME else [])
+    for table_name in tables:
+        for page in parallel_scan(dynamodb.meta.client, table_name, ProjectionExpression='symbol'):
+            symbols.update(item['symbol'] for item in page)
+    return sorted(symbols)
+
+
+def _query(symbol, start=None, end=None):
+    """History items of `symbol` with start <= timestamp < end, oldest first, page by page."""
+    dynamodb, _ = get_clients()
+    table = dynamodb.Table(TABLE_NAME)
+    condition = Key('symbol').eq(symbol)
+    if start is not None and end is not None:
+        condition &= Key('timestamp').between(start, end - 1)
+    elif end is not None:
+        condition &= Key('timestamp').lt(end)
+    elif start is not None:
+        condition &= Key('timestamp').gte(start)
+    kwargs = {'KeyConditionExpression': condition}
+    while True:
+        response = table.query(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _archive_day(symbol, items):
+    dynamodb, s3 = get_clients()
+    first, last = int(items[0]['timestamp']), int(items[-1]['timestamp'])
+    key = f"{_day_prefix(symbol, _date(first))}{first}-{last}.ndjson.gz"
+    s3.put_object(Bucket=ARCHIVE_BUCKET, Key=key, Body=encode_items(items),
+                  ContentType='application/x-ndjson', ContentEncoding='gzip')
+    with dynamodb.Table(TABLE_NAME).batch_writer(overwrite_by_pkeys=['symbol', 'timestamp']) as batch:
+        for item in items:
+            batch.delete_item(Key={'symbol': item['symbol'], 'timestamp': item['timestamp']})
+    return key
+
+
+def archive_symbol(symbol, cutoff):
+    """Archive and evict every history item of `symbol` older than `cutoff`. Returns (items, objects).
+
+    The newest item always stays: without a latest-state table it is the
+    symbol's only record of its position and gain.
+    """
+    newest = _edge_in_table(symbol, newest=True)
+    if newest is None:
+        return 0, 0
+    archived = objects = 0
+    day, items = None, []
+    for item in _query(symbol, end=min(cutoff, newest)):
+        item_day = int(item['timestamp']) // DAY_MS
+        if items and item_day != day:
+            _archive_day(symbol, items)
+            archived, objects = archived + len(items), objects + 1
+            items = []
+        day = item_day
+        items.append(item)
+    if items:
+        _archive_day(symbol, items)
+        archived, objects = archived + len(items), objects + 1
+    return archived, objects
+
+
+def _edge_in_table(symbol, newest=False):
+    """Timestamp of the oldest (or newest) item of `symbol` still in the table, or None."""
+    dynamodb, _ = get_clients()
+    response = dynamodb.Table(TABLE_NAME).query(KeyConditionExpression=Key('symbol').eq(symbol),
+                                                ProjectionExpression='#ts', ScanIndexForward=not newest,
+                                                ExpressionAttributeNames={'#ts': 'timestamp'}, Limit=1)
+    return int(response['Items'][0]['timestamp']) if response['Items'] else None
+
+
+def read_history(symbol, start, end=None):
+    """History items of `symbol` with start <= timestamp < end, from the table and the archive.
+
+    Whatever part of the range lies before the oldest item still in the table
+    is read from S3, whichever ARCHIVE_AFTER_DAYS the archiver ran with.
+    """
+    end = int(time.time() * 1000) if end is None else end
+    items = {int(item['timestamp']): item for item in _query(symbol, start, end)}
+
+    oldest = _edge_in_table(symbol)
+    archived_end = end if oldest is None else min(end, oldest + 1)
+    if start < archived_end:
+        _, s3 = get_clients()
+        paginator = s3.get_paginator('list_objects_v2')
+        for day in range(start // DAY_MS, (archived_end - 1) // DAY_MS + 1):
+            prefix = _day_prefix(symbol, _date(day * DAY_MS))
+            for page in paginator.paginate(Bucket=ARCHIVE_BUCKET, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    body = s3.get_object(Bucket=ARCHIVE_BUCKET, Key=obj['Key'])['Body'].read()
+                    for item in decode_items(body):
+                        if start <= item['timestamp'] < end:
+                            items.setdefault(int(item['timestamp']), item)
+    return [items[ts] for ts in sorted(items)]
+
+
+def lambda_handler(event, context):
+    cutoff = cutoff_timestamp()
+    symbols = (event or {}).get('symbols') or list_symbols()
+    archived = objects = 0
+    done = []
+    for symbol in symbols:
+        if context is not None and context.get_remaining_time_in_millis() < TIME_RESERVE_MS:
+            break  # the next run carries on where this one stopped
+        count, written = archive_symbol(symbol, cutoff)
+        archived, objects = archived + count, objects + written
+        done.append(symbol)
+    print(f"Archived {archived} items older than {_date(cutoff)} into {objects} objects for {len(done)} symbols")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'cutoff': cutoff, 'archived': archived, 'objects': objects,
+                            'symbols': done, 'remaining': len(symbols) - len(done)})
+    }
@@ -0,0 +1,128 @@
+"""Columnar encodings for exported state items.
+
+Items become typed columns: timestamps as int64, prices and gains as
+float64 (what DecimalEncoder already turns them into) and the rest as
+strings. Every file has the same known columns, plus any extra attributes
+found in its items, so a directory of files reads as one dataset.
+
+`parquet` needs pyarrow. Files are sorted by timestamp, zstd compressed, and
+carry min/max statistics for every row group, so readers can prune by time
+range and read only the columns they ask for. `ndjson` is the fallback when
+pyarrow is missing: one typed JSON object per line, zstd compressed, which
+needs zstandard. It has no footer, so its statistics are returned to the
+caller to store next to the file. Both packages come from requirements.txt;
+a missing one is an error, never a silent switch to another encoding.
+"""
+import io
+import json
+from decimal import Decimal
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import serializer
+
+ROW_GROUP_SIZE = 16384
+
+# Column kinds: 'int' (int64), 'float' (float64), 'string'
+COLUMNS = {
+    'symbol': 'string',
+    'timestamp': 'int',
+    'history_timestamp': 'int',
+    'price': 'float',
+    'action': 'string',
+    'position': 'string',
+    'accumulated_gain': 'float',
+    'last_trade_price': 'float',
+    'indicator_state': 'string',
+}
+
+
+def _kind(values):
+    """Column kind of an attribute that is not in COLUMNS."""
+    values = [v for v in values if v is not None]
+    if values and all(isinstance(v, Decimal) for v in values):
+        return 'int' if all(v == v.to_integral_value() for v in values) else 'float'
+    return 'string'
+
+
+def _convert(value, kind):
+    if value is None:
+        return None
+    if kind == 'int':
+        return int(value)
+    if kind == 'float':
+        return float(value)
+    if isinstance(value, str):
+        return value
+    return json.dumps(serializer.to_json_types(value), sort_keys=True)
+
+
+def to_columns(items):
+    """(schema, columns): the kind of every column and its converted values, sorted by timestamp."""
+    items = sorted(items, key=lambda item: int(item['timestamp']))
+    schema = dict(COLUMNS)
+    extra = sorted({name for item in items for name in item} - set(COLUMNS))
+    for name in extra:
+        schema[name] = _kind([item.get(name) for item in items])
+    columns = {name: [_convert(item.get(name), kind) for item in items] for name, kind in schema.items()}
+    return schema, columns
+
+
+def column_stats(columns):
+    """{column: {'min', 'max', 'nulls'}} for a file, in the spirit of Parquet row-group statistics."""
+    stats = {}
+    for name, values in columns.items():
+        present = [v for v in values if v is not None]
+        stats[name] = {'min': min(present) if present else None,
+                       'max': max(present) if present else None,
+                       'nulls': len(values) - len(present)}
+    return stats
+
+
+def encode_parquet(items):
+    if pyarrow is None:
+        raise RuntimeError("EXPORT_FORMAT=parquet needs pyarrow")
+    types = {'int': pyarrow.int64(), 'float': pyarrow.float64(), 'string': pyarrow.string()}
+    schema, columns = to_columns(items)
+    table = pyarrow.table({name: pyarrow.array(columns[name], type=types[kind]) for name, kind in schema.items()})
+    out = io.BytesIO()
+    pyarrow.parquet.write_table(table, out, compression='zstd', row_group_size=ROW_GROUP_SIZE,
+                                write_statistics=True)
+    return out.getvalue()
+
+
+def encode_ndjson(items):
+    """Returns (zstd compressed body, statistics)."""
+    if zstandard is None:
+        raise RuntimeError("EXPORT_FORMAT=ndjson needs zstandard")
+    schema, columns = to_columns(items)
+    names = list(schema)
+    rows = zip(*(columns[name] for name in names))
+    text = ''.join(json.dumps(dict(zip(names, row)), separators=(',', ':')) + '\n' for row in rows).encode()
+    return zstandard.ZstdCompressor(level=3).compress(text), column_stats(columns)
+
+
+def default_format():
+    return 'parquet' if pyarrow is not None else 'ndjson'
+
+
+def encode(items, fmt):
+    """Encode items as `fmt` ('parquet' or 'ndjson').
+
+    Returns (body, file extension, put_object arguments, statistics or None).
+    """
+    if fmt == 'parquet':
+        return encode_parquet(items), '.parquet', {'ContentType': 'application/vnd.apache.parquet'}, None
+    if fmt == 'ndjson':
+        body, stats = encode_ndjson(items)
+        return body, '.ndjson.zst', {'ContentType': 'application/x-ndjson', 'ContentEncoding': 'zstd'}, stats
+    raise ValueError(f"Unknown export format {fmt!r}")
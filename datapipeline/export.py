@@ -0,0 +1,146 @@
+"""Streaming table export: parallel segmented scan into an S3 multipart upload.
+
+`parallel_scan` runs one thread per scan segment. Each thread follows
+LastEvaluatedKey to the end of its segment and hands pages over through a
+bounded queue, so at most a few 1 MB pages are held at once.
+`MultipartUpload` sends the encoded output in fixed-size parts as it is
+produced. Memory therefore stays flat whatever the table size, and export
+time scales with the number of segments.
+"""
+import queue
+import threading
+
+import serializer
+
+PART_SIZE = 8 * 1024 * 1024  # S3 minimum is 5 MiB for every part but the last
+QUEUE_PAGES_PER_SEGMENT = 2
+
+_DONE = object()
+
+
+def _scan_segment(client, table_name, segment, total_segments, pages, stop, scan_kwargs):
+    try:
+        kwargs = dict(scan_kwargs, TableName=table_name, Segment=segment, TotalSegments=total_segments)
+        while not stop.is_set():
+            response = client.scan(**kwargs)
+            pages.put(response['Items'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        pages.put(_DONE)
+    except BaseException as e:
+        pages.put(e)
+
+
+def parallel_scan(client, table_name, total_segments=8, **scan_kwargs):
+    """Yield pages (lists of items, with Decimal numbers) of a whole-table scan.
+
+    `client` is the client behind a DynamoDB resource (`resource.meta.client`).
+    Unlike the resource it is safe to share between the segment threads, and
+    it still returns plain Python values. Pages arrive in no particular order.
+    """
+    pages = queue.Queue(maxsize=total_segments * QUEUE_PAGES_PER_SEGMENT)
+    stop = threading.Event()
+    threads = [threading.Thread(target=_scan_segment, daemon=True,
+                                args=(client, table_name, segment, total_segments, pages, stop, scan_kwargs))
+               for segment in range(total_segments)]
+    for thread in threads:
+        thread.start()
+    running = total_segments
+    try:
+        while running:
+            page = pages.get()
+            if page is _DONE:
+                running -= 1
+            elif isinstance(page, BaseException):
+                raise page
+            else:
+                yield page
+    finally:
+        stop.set()
+        while any(thread.is_alive() for thread in threads):
+            try:  # unblock segments waiting on a full queue
+                pages.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+class MultipartUpload:
+    """File-like writer that streams into an S3 object.
+
+    The multipart upload is only started once a full part is buffered. Small
+    outputs go out as one put_object. Any failure aborts the upload, so no
+    orphaned parts are left behind.
+    """
+
+    def __init__(self, s3, bucket, key, part_size=PART_SIZE, content_type='application/json'):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.content_type = content_type
+        self.upload_id = None
+        self.parts = []
+        self.size = 0
+        self._buffer = bytearray()
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+
+    def _upload_part(self, body):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type)['UploadId']
+        number = len(self.parts) + 1
+        response = self.s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                       PartNumber=number, Body=body)
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+
+    def close(self):
+        if self.upload_id is None:
+            self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer),
+                               ContentType=self.content_type)
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.s3.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                              MultipartUpload={'Parts': self.parts})
+        self._buffer = bytearray()
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_json_array(pages, out, encode_items=serializer.encode_items):
+    """Write items from `pages` as one JSON array, as json.dumps(items, cls=DecimalEncoder) would.
+
+    Each page is encoded in one piece, and `out` sees one write per page.
+    Returns the number of items written.
+    """
+    count = 0
+    out.write('[')
+    for page in pages:
+        if not page:
+            continue
+        out.write((', ' if count else '') + encode_items(page))
+        count += len(page)
+    out.write(']')
+    return count
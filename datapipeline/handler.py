@@ -1,25 +1,41 @@
 import boto3
 import json
+import os
 from decimal import Decimal
 
+from export import MultipartUpload, parallel_scan, write_json_array
+
+# 'full' rewrites my-data.json from a scan, 'incremental' appends only new items
+EXPORT_MODE = os.environ.get('EXPORT_MODE', 'full')
+# Parallel scan segments, each read by its own thread
+EXPORT_SEGMENTS = int(os.environ.get('EXPORT_SEGMENTS', '8'))
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, Decimal):
             return float(o)
         return super(DecimalEncoder, self).default(o)
 
+# Created once per container and reused by warm invocations
+dynamodb = None
+s3 = None
+
+def get_clients():
+    global dynamodb, s3
+    if dynamodb is None:
+        dynamodb = boto3.resource('dynamodb', region_name='ap-southeast-1')
+        s3 = boto3.client('s3', region_name='ap-southeast-1')
+    return dynamodb, s3
+
 def lambda_handler(event, context):
-    dynamodb = boto3.resource('dynamodb', region_name='ap-southeast-1')
-    s3 = boto3.client('s3', region_name='ap-southeast-1')
-    
-    table = dynamodb.Table('TradingState')
-    
-    # Scanning the entire table (adjust based on your table's size)
-    response = table.scan()
-    items = response['Items']
-    
-    # Convert data to JSON
-    data_str = json.dumps(items, cls=DecimalEncoder)
-    
-    # Upload data to S3
-    s3.put_object(Body=data_str, Bucket='tradingdatabucket', Key='my-data.json')
+    if EXPORT_MODE == 'incremental':
+        from incremental import export_incremental  # imports this module
+        return export_incremental((event or {}).get('symbols'))
+
+    dynamodb, s3 = get_clients()
+
+    # Scan every page of every segment and stream the JSON array straight to S3
+    pages = parallel_scan(dynamodb.meta.client, 'TradingState', EXPORT_SEGMENTS)
+    with MultipartUpload(s3, 'tradingdatabucket', 'my-data.json') as out:
+        count = write_json_array(pages, out)
+    print(f"Exported {count} items ({out.size} bytes) to my-data.json")
@@ -0,0 +1,204 @@
+"""Incremental export: only the state items written since the last run.
+
+A manifest at s3://EXPORT_BUCKET/EXPORT_PREFIX/manifest.json holds the
+high-water timestamp of every symbol. Each run queries
+`timestamp > watermark` per symbol, so its cost follows the new data and not
+the table size. New items are written as append-only objects, one per symbol
+and UTC day, under
+
+    s3://EXPORT_BUCKET/EXPORT_PREFIX/symbol=<symbol>/date=<YYYY-MM-DD>/<first>-<last>.<format>
+
+Rows of the current day wait in the table until EXPORT_FLUSH_ROWS of them
+have piled up or the oldest is EXPORT_FLUSH_MINUTES old. A symbol therefore
+gets a handful of objects per day instead of one per minute. The watermark
+stays behind the waiting rows, so nothing needs buffering outside DynamoDB.
+Past days are always written whole.
+
+EXPORT_FORMAT picks the encoding: `json` arrays as in my-data.json,
+`parquet` or `ndjson` (see columnar.py), or `columnar` for Parquet when
+pyarrow is available and NDJSON otherwise. NDJSON objects get their column
+statistics in a `.stats.json` sidecar.
+
+The manifest only moves forward after the objects are written. It is saved
+as objects complete, at most every MANIFEST_SAVE_SECONDS, so a long first run
+over years of history keeps its progress even when it runs out of time. New
+symbols are not started once less than TIME_RESERVE_MS of the invocation is
+left. If a run fails between an object and its manifest save, the next run
+exports those items again, and readers dedupe on (symbol, timestamp).
+"""
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.dynamodb.conditions import Key
+
+import columnar
+from archive import DAY_MS, list_symbols
+from export import MultipartUpload, write_json_array
+from handler import get_clients
+
+EXPORT_BUCKET = os.environ.get('EXPORT_BUCKET', 'tradingdatabucket')
+EXPORT_PREFIX = os.environ.get('EXPORT_PREFIX', 'incremental')
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '8'))
+EXPORT_FORMAT = os.environ.get('EXPORT_FORMAT', 'json')
+EXPORT_FLUSH_ROWS = int(os.environ.get('EXPORT_FLUSH_ROWS', '10000'))
+EXPORT_FLUSH_MINUTES = float(os.environ.get('EXPORT_FLUSH_MINUTES', '60'))
+TABLE_NAME = 'TradingState'
+MANIFEST_KEY = f"{EXPORT_PREFIX}/manifest.json"
+MANIFEST_SAVE_SECONDS = 5
+# Stop starting new symbols and days when the invocation has less time than this left
+TIME_RESERVE_MS = 10 * 1000
+
+
+def load_manifest():
+    _, s3 = get_clients()
+    try:
+        body = s3.get_object(Bucket=EXPORT_BUCKET, Key=MANIFEST_KEY)['Body'].read()
+    except s3.exceptions.NoSuchKey:
+        return {'watermarks': {}}
+    return json.loads(body)
+
+
+def save_manifest(manifest):
+    _, s3 = get_clients()
+    s3.put_object(Bucket=EXPORT_BUCKET, Key=MANIFEST_KEY, Body=json.dumps(manifest, indent=1),
+                  ContentType='application/json')
+
+
+def new_items(symbol, watermark=None):
+    """History items of `symbol` newer than `watermark`, oldest first, page by page."""
+    dynamodb, _ = get_clients()
+    table = dynamodb.Table(TABLE_NAME)
+    condition = Key('symbol').eq(symbol)
+    if watermark is not None:
+        condition &= Key('timestamp').gt(watermark)
+    # Strongly consistent, so no item below the new watermark can show up later
+    kwargs = {'KeyConditionExpression': condition, 'ConsistentRead': True}
+    while True:
+        response = table.query(**kwargs)
+        yield from response['Items']
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _write_day(symbol, items):
+    _, s3 = get_clients()
+    first, last = int(items[0]['timestamp']), int(items[-1]['timestamp'])
+    date = datetime.datetime.utcfromtimestamp(first // 1000).strftime('%Y-%m-%d')
+    key = f"{EXPORT_PREFIX}/symbol={symbol}/date={date}/{first}-{last}"
+    fmt = columnar.default_format() if EXPORT_FORMAT == 'columnar' else EXPORT_FORMAT
+    if fmt == 'json':
+        key += '.json'
+        with MultipartUpload(s3, EXPORT_BUCKET, key) as out:
+            write_json_array([items], out)
+        return key
+
+    body, extension, put_args, stats = columnar.encode(items, fmt)
+    key += extension
+    s3.put_object(Bucket=EXPORT_BUCKET, Key=key, Body=body, **put_args)
+    if stats is not None:
+        s3.put_object(Bucket=EXPORT_BUCKET, Key=key + '.stats.json', ContentType='application/json',
+                      Body=json.dumps({'rows': len(items), 'columns': stats}))
+    return key
+
+
+def export_symbol(symbol, watermark=None, written=None, stop=None):
+    """Write the items of `symbol` newer than `watermark`, one object per day.
+
+    `written(symbol, watermark, key, count)` is called after every object, and
+    no further day is started once `stop()` is true. Returns the new watermark
+    and whether every item was written.
+    """
+    day, items = None, []
+    for item in new_items(symbol, watermark):
+        item_day = int(item['timestamp']) // DAY_MS
+        if items and item_day != day:
+            watermark = _flush(symbol, items, written)
+            items = []
+            if stop is not None and stop():
+                return watermark, False
+        day = item_day
+        items.append(item)
+    if items and _due(items):
+        watermark = _flush(symbol, items, written)
+    return watermark, True
+
+
+def _due(items, now=None):
+    """Whether the last, possibly still growing, day of a symbol should be written now."""
+    now = int(time.time() * 1000) if now is None else now
+    first = int(items[0]['timestamp'])
+    return (first // DAY_MS < now // DAY_MS or len(items) >= EXPORT_FLUSH_ROWS
+            or now - first >= EXPORT_FLUSH_MINUTES * 60 * 1000)
+
+
+def _flush(symbol, items, written):
+    key = _write_day(symbol, items)
+    watermark = int(items[-1]['timestamp'])
+    if written is not None:
+        written(symbol, watermark, key, len(items))
+    return watermark
+
+
+def export_incremental(symbols=None, context=None):
+    manifest = load_manifest()
+    watermarks = manifest.setdefault('watermarks', {})
+    # Only the first run pays for a scan of the history; later ones know its symbols
+    symbols = symbols or sorted(set(list_symbols(history=not watermarks)) | set(watermarks))
+
+    lock = threading.Lock()
+    objects, errors = [], {}
+    progress = {'exported': 0, 'saved': time.monotonic()}
+
+    def save():
+        manifest['updated'] = int(time.time() * 1000)
+        manifest['last_run'] = {'items': progress['exported'], 'objects': list(objects)}
+        save_manifest(manifest)
+        progress['saved'] = time.monotonic()
+
+    def written(symbol, watermark, key, count):
+        with lock:
+            watermarks[symbol] = watermark
+            objects.append(key)
+            progress['exported'] += count
+            if time.monotonic() - progress['saved'] >= MANIFEST_SAVE_SECONDS:
+                save()
+
+    def stop():
+        return context is not None and context.get_remaining_time_in_millis() < TIME_RESERVE_MS
+
+    def run(symbol):
+        if stop():
+            return symbol, False, None  # the next run carries on where this one stopped
+        try:
+            _, finished = export_symbol(symbol, watermarks.get(symbol), written, stop)
+            return symbol, finished, None
+        except Exception as e:
+            return symbol, False, repr(e)
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=EXPORT_WORKERS) as pool:
+        for symbol, finished, error in pool.map(run, symbols):
+            done += finished
+            if error is not None:
+                errors[symbol] = error
+
+    with lock:
+        if objects:
+            save()
+    exported = progress['exported']
+    print(f"Exported {exported} new items into {len(objects)} objects for {done}/{len(symbols)} symbols"
+          + (f", {len(errors)} failed" if errors else ""))
+    return {
+        'statusCode': 200 if not errors else 500,
+        'body': json.dumps({'exported': exported, 'objects': len(objects), 'errors': errors,
+                            'remaining': len(symbols) - done - len(errors)})
+    }
+
+
+def lambda_handler(event, context):
+    return export_incremental((event or {}).get('symbols'), context)
@@ -1,6 +1,5 @@
 import json
 import os
-import pymysql
 from datetime import datetime, timezone
 
 
@@ -11,13 +10,37 @@ db_password = os.environ['DB_PASSWORD']
 db_name = os.environ['DB_NAME']
 db_table_name = os.environ['DB_TABLE_NAME']
 
+# Opened on the first record that needs it and kept for warm invocations
+connection = None
+
+class ConnectionFailed(Exception):
+    """MySQL could not be reached; the batch must fail so the stream retries it."""
+
+def get_connection():
+    global connection
+    if connection is None:
+        import pymysql  # deferred: the vendored package is only needed once there is a row to insert
+
+        connection = pymysql.connect(host=db_host, user=db_user, password=db_password, db=db_name)
+    else:
+        connection.ping(reconnect=True)
+    return connection
+
+def close_connection():
+    global connection
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+        connection = None
+
 def lambda_handler(event, context):
 
     # Log the received event
     print("Received event: " + json.dumps(event, indent=2))
 
-    connection = pymysql.connect(host=db_host, user=db_user, password=db_password, db=db_name)
-
+    connection = None
     try:
         for record in event['Records']:
             # Check if the event is an INSERT operation
@@ -43,6 +66,11 @@ def lambda_handler(event, context):
                       f"Accumulated Gain: {accumulated_gain}, Position: {position}, Timestamp: {timestamp}")
 
                 # Prepare SQL query
+                if connection is None:
+                    try:
+                        connection = get_connection()
+                    except Exception as e:
+                        raise ConnectionFailed(e) from e
                 with connection.cursor() as cursor:
                     sql = f"INSERT INTO {db_table_name} (timestamp, symbol, price, action, accumulated_gain, position) VALUES (%s, %s, %s, %s, %s, %s)"
                     cursor.execute(sql, (timestamp, symbol, price, action, accumulated_gain, position))
@@ -50,11 +78,12 @@ def lambda_handler(event, context):
                 # Commit the changes
                 connection.commit()
 
+    except ConnectionFailed:
+        close_connection()
+        raise
     except Exception as e:
         print(f"An error occurred: {e}")
-    finally:
-        # Close the connection
-        connection.close()
+        close_connection()
 
     return {
         'statusCode': 200,
@@ -1,16 +1,49 @@
+import argparse
+import json
 import logging
 import time
+from contextlib import contextmanager
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from config import BINANCE_API_KEY, BINANCE_API_SECRET
+from market_stream import BinanceStreamFeed, ReplayFeed, StreamState
 
 # Set up logging configuration
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s',
                     datefmt='%Y-%m-%d %H:%M:%S')
 
-# Binance client initialization
-client = Client(api_key=BINANCE_API_KEY, api_secret=BINANCE_API_SECRET)
+SYMBOL = "BTCUSDT"
+MA_WINDOW = 20
+
+# Stage timings in ms and the data age of the current tick, logged when the tick ends
+tick_timings = {}
+
+# Binance client, created on first use so replay mode never touches the network
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        client = Client(api_key=BINANCE_API_KEY, api_secret=BINANCE_API_SECRET)
+    return client
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        tick_timings[name] = round((time.perf_counter() - started) * 1000, 3)
+
+def data_age(data_time):
+    """Record how old the data behind this tick's decision is, from its close or event time in ms."""
+    if data_time is not None:
+        tick_timings['data_age'] = int(time.time() * 1000) - data_time
+
+def log_tick():
+    logging.info("Tick latency (ms): %s", json.dumps(tick_timings))
+    tick_timings.clear()
 
 # Additional global variables to manage the trading position and prices
 position_price = None
@@ -20,7 +53,8 @@ current_profit = 0
 
 def get_current_price():
     try:
-        ticker = client.get_symbol_ticker(symbol="BTCUSDT")
+        with stage('binance_ticker'):
+            ticker = get_client().get_symbol_ticker(symbol=SYMBOL)
         return float(ticker["price"])
     except BinanceAPIException as e:
         logging.error("Error fetching current price: %s", e)
@@ -29,8 +63,11 @@ def get_current_price():
 def moving_average():
     try:
         # Adjusted to get the last 20 minutes of data for the moving average calculation
-        klines = client.get_klines(symbol="BTCUSDT", interval=Client.KLINE_INTERVAL_1MINUTE)
-        prices = [float(k[4]) for k in klines[-20:]]
+        with stage('binance_klines'):
+            klines = get_client().get_klines(symbol=SYMBOL, interval=Client.KLINE_INTERVAL_1MINUTE)
+        now = int(time.time() * 1000)
+        data_age(next((k[6] for k in reversed(klines) if k[6] < now), None))
+        prices = [float(k[4]) for k in klines[-MA_WINDOW:]]
         return sum(prices) / len(prices)
     except BinanceAPIException as e:
         logging.error("Error fetching historical data: %s", e)
@@ -54,43 +91,88 @@ def sell():
     stop_loss = None
     take_profit = None
 
-def main():
-    global position_price
+def evaluate(current_price, ma, position):
+    """Apply the MA strategy to the latest price.
+
+    Returns the new position flag and whether a stop-loss or take-profit exit
+    happened, after which the polling loop refetches at once instead of sleeping.
+    """
     global current_profit
 
+    # Check stop-loss and take-profit levels
+    if position and (current_price <= stop_loss or current_price >= take_profit):
+        sell()
+        current_profit += current_price
+        logging.info("Sold due to hitting stop-loss/take-profit at %s, current profit is %s", current_price, current_profit)
+        return False, True
+
+    # Original strategy
+    if not position and current_price > ma:
+        buy(current_price)
+        current_profit -= current_price
+        logging.info("Bought at %s, current profit is %s", current_price, current_profit)
+        return True, False
+    elif position and current_price < ma:
+        sell()
+        current_profit += current_price
+        logging.info("Sold at %s, current profit is %s", current_price, current_profit)
+        return False, False
+
+    return position, False
+
+def main():
     position = False
     while True:
-        current_price = get_current_price()
-        ma = moving_average()
+        limit_exit = False
+        with stage('tick'):
+            current_price = get_current_price()
+            ma = moving_average()
+
+            if current_price is not None and ma is not None:
+                logging.info("Current price is %s, Moving Average is %s", current_price, ma)
+                with stage('decision'):
+                    position, limit_exit = evaluate(current_price, ma, position)
+        log_tick()
 
         if current_price is None or ma is None:
             logging.warning("Failed to fetch price or MA, retrying in next iteration")
-            time.sleep(60)  # Sleep for 1 minute
+        elif limit_exit:
             continue
 
-        logging.info("Current price is %s, Moving Average is %s", current_price, ma)
+        time.sleep(60)  # Sleep for 1 minute
 
-        # Check stop-loss and take-profit levels
-        if position and (current_price <= stop_loss or current_price >= take_profit):
-            sell()
-            position = False
-            current_profit += current_price
-            logging.info("Sold due to hitting stop-loss/take-profit at %s, current profit is %s", current_price, current_profit)
-            continue
+def stream_main(feed, seed_klines=None):
+    """Run the strategy on websocket events instead of polling every minute."""
+    state = StreamState(window=MA_WINDOW)
+    if seed_klines:
+        state.seed(seed_klines)
+    position = False
 
-        # Original strategy
-        if not position and current_price > ma:
-            buy(current_price)
-            position = True
-            current_profit -= current_price
-            logging.info("Bought at %s, current profit is %s", current_price, current_profit)
-        elif position and current_price < ma:
-            sell()
-            position = False
-            current_profit += current_price
-            logging.info("Sold at %s, current profit is %s", current_price, current_profit)
+    def on_message(msg):
+        nonlocal position
+        if not state.on_message(msg):
+            return
+        ma = state.moving_average
+        if state.price is None or ma is None:
+            return
+        data_age(state.event_time)
+        with stage('decision'):
+            position, _ = evaluate(state.price, ma, position)
+        log_tick()
 
-        time.sleep(60)  # Sleep for 1 minute
+    feed.run(on_message)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stream", action="store_true", help="trade on websocket events instead of polling")
+    parser.add_argument("--record", help="append received websocket events to this NDJSON file")
+    parser.add_argument("--replay", help="replay a recorded NDJSON file offline")
+    args = parser.parse_args()
+
+    if args.replay:
+        stream_main(ReplayFeed(args.replay))
+    elif args.stream:
+        seed = get_client().get_klines(symbol=SYMBOL, interval=Client.KLINE_INTERVAL_1MINUTE, limit=MA_WINDOW + 1)
+        stream_main(BinanceStreamFeed(SYMBOL, BINANCE_API_KEY, BINANCE_API_SECRET, record_path=args.record), seed)
+    else:
+        main()
@@ -0,0 +1,115 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+
+class StreamState:
+    """Last price and moving average kept up to date from kline and trade events."""
+
+    def __init__(self, window=20):
+        self.window = window
+        self.closes = deque(maxlen=window)
+        self.total = 0.0
+        self.price = None
+        self.event_time = None
+
+    def seed(self, klines):
+        """Warm the moving average from REST klines, skipping the candle still in progress."""
+        now = int(time.time() * 1000)
+        for k in klines:
+            if k[6] < now:
+                self._add_close(float(k[4]))
+        if klines:
+            self.price = float(klines[-1][4])
+
+    def _add_close(self, close):
+        if len(self.closes) == self.window:
+            self.total -= self.closes[0]
+        self.closes.append(close)
+        self.total += close
+
+    @property
+    def moving_average(self):
+        if len(self.closes) < self.window:
+            return None
+        return self.total / self.window
+
+    def on_message(self, msg):
+        """Apply a websocket message. Returns True when price or MA changed."""
+        event = msg.get('e')
+        if event == 'trade':
+            self.price = float(msg['p'])
+            self.event_time = msg['T']
+            return True
+        if event == 'kline':
+            k = msg['k']
+            self.price = float(k['c'])
+            self.event_time = msg['E']
+            if k['x']:  # candle closed
+                self._add_close(float(k['c']))
+            return True
+        if event == 'error':
+            logging.error("Websocket error: %s", msg.get('m'))
+        return False
+
+
+class BinanceStreamFeed:
+    """Live kline and trade websocket events, optionally recorded for later replay."""
+
+    def __init__(self, symbol, api_key=None, api_secret=None, interval='1m', record_path=None):
+        self.symbol = symbol
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.interval = interval
+        self.record_path = record_path
+        self._record_lock = threading.Lock()
+
+    def run(self, callback):
+        from binance import ThreadedWebsocketManager
+
+        record = open(self.record_path, 'a') if self.record_path else None
+
+        def handle(msg):
+            if record:
+                with self._record_lock:
+                    record.write(json.dumps(msg) + '\n')
+            callback(msg)
+
+        twm = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret)
+        twm.start()
+        try:
+            twm.start_kline_socket(callback=handle, symbol=self.symbol, interval=self.interval)
+            twm.start_trade_socket(callback=handle, symbol=self.symbol)
+            twm.join()
+        finally:
+            twm.stop()
+            if record:
+                record.close()
+
+
+class ReplayFeed:
+    """Offline stand-in for BinanceStreamFeed that replays a recorded NDJSON file.
+
+    With `speed` set, event timestamps are honoured (2.0 plays twice as fast);
+    by default events are delivered as fast as the callback consumes them.
+    """
+
+    def __init__(self, path, speed=None):
+        self.path = path
+        self.speed = speed
+
+    def run(self, callback):
+        last_event_time = None
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                msg = json.loads(line)
+                event_time = msg.get('E')
+                if self.speed and event_time and last_event_time:
+                    time.sleep(max(0, event_time - last_event_time) / 1000.0 / self.speed)
+                last_event_time = event_time or last_event_time
+                callback(msg)
@@ -0,0 +1,199 @@
+"""Request-weight aware wrapper around binance.client.Client.
+
+Every call first takes its endpoint weight from a token bucket sized to the
+account's per-minute request-weight limit. After each response the bucket is
+resynchronised with the `X-MBX-USED-WEIGHT-1M` header. A 429 or 418 reply
+closes the bucket until the `Retry-After` time passes.
+
+Identical read-only calls issued while one is already in flight share that
+call's result instead of hitting the API again. A slice of the budget is
+reserved for order-path calls, and data calls queue behind any order that is
+waiting.
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from binance.exceptions import BinanceAPIException
+from binance.helpers import convert_ts_str, interval_to_milliseconds
+
+REQUEST_WEIGHT_LIMIT = int(os.environ.get('BINANCE_REQUEST_WEIGHT_LIMIT', '6000'))
+ORDER_RESERVE = 0.1  # share of the budget data calls may not use
+
+ORDER_METHODS = {
+    'create_order', 'create_test_order', 'order_limit', 'order_limit_buy', 'order_limit_sell',
+    'order_market', 'order_market_buy', 'order_market_sell', 'cancel_order', 'get_order',
+    'get_open_orders',
+}
+
+# Read-only calls whose concurrent duplicates can share one request
+COALESCED_METHODS = {
+    'get_symbol_ticker', 'get_ticker', 'get_orderbook_ticker', 'get_klines', 'get_historical_klines',
+    'get_order_book', 'get_exchange_info', 'get_symbol_info', 'get_server_time', 'get_avg_price',
+}
+
+
+def _depth_weight(limit):
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+def _historical_klines_weight(args, kwargs):
+    # get_historical_klines pages internally: one lookup of the first valid
+    # candle, then a get_klines call per `limit` candles in the range
+    interval = args[1] if len(args) > 1 else kwargs.get('interval')
+    start = convert_ts_str(args[2] if len(args) > 2 else kwargs.get('start_str'))
+    end = convert_ts_str(args[3] if len(args) > 3 else kwargs.get('end_str')) or int(time.time() * 1000)
+    limit = kwargs.get('limit', 1000)
+    interval_ms = interval_to_milliseconds(interval) or 60000
+    pages = math.ceil(max(end - (start or end), 0) / (interval_ms * limit)) + 1
+    return 2 + 2 * pages
+
+
+ENDPOINT_WEIGHTS = {
+    'get_symbol_ticker': lambda args, kwargs: 2 if kwargs.get('symbol') else 4,
+    'get_ticker': lambda args, kwargs: 2 if kwargs.get('symbol') else 80,
+    'get_orderbook_ticker': lambda args, kwargs: 2 if kwargs.get('symbol') else 4,
+    'get_klines': lambda args, kwargs: 2,
+    'get_historical_klines': _historical_klines_weight,
+    'get_order_book': lambda args, kwargs: _depth_weight(kwargs.get('limit', 100)),
+    'get_exchange_info': lambda args, kwargs: 20,
+    'get_symbol_info': lambda args, kwargs: 20,
+    'get_avg_price': lambda args, kwargs: 2,
+    'get_open_orders': lambda args, kwargs: 6 if kwargs.get('symbol') else 80,
+    'get_order': lambda args, kwargs: 4,
+}
+
+
+def request_weight(name, args, kwargs):
+    weight = ENDPOINT_WEIGHTS.get(name)
+    return weight(args, kwargs) if weight else 1
+
+
+class WeightBucket:
+    """Token bucket over the rolling one-minute request-weight budget."""
+
+    def __init__(self, limit=REQUEST_WEIGHT_LIMIT, order_reserve=ORDER_RESERVE):
+        self.limit = limit
+        self.reserve = limit * order_reserve
+        self.tokens = float(limit)
+        self.rate = limit / 60.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.orders_waiting = 0
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def acquire(self, weight, order=False):
+        with self._cond:
+            if order:
+                self.orders_waiting += 1
+            try:
+                while True:
+                    now = self._refill()
+                    floor = 0 if order else self.reserve
+                    # A call heavier than the usable budget (a long paged range) goes
+                    # out once the bucket is full, and the debt delays later calls
+                    needed = min(weight, self.limit - floor)
+                    if now >= self.blocked_until and self.tokens - needed >= floor \
+                            and (order or not self.orders_waiting):
+                        self.tokens -= weight
+                        return
+                    if now < self.blocked_until:
+                        wait = self.blocked_until - now
+                    else:
+                        wait = max(needed + floor - self.tokens, 1) / self.rate
+                    self._cond.wait(min(wait, 1.0))
+            finally:
+                if order:
+                    self.orders_waiting -= 1
+                    self._cond.notify_all()
+
+    def sync(self, used_weight):
+        """Trust the server's count when it says more weight is used than we think."""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.tokens, self.limit - used_weight)
+
+    def block(self, seconds):
+        with self._cond:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class RateLimitedClient:
+    """Drop-in proxy for a binance Client that schedules calls by request weight."""
+
+    def __init__(self, client, bucket=None):
+        self._client = client
+        self._bucket = bucket or WeightBucket()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def call(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                key = None
+            if name not in COALESCED_METHODS or key is None:
+                return self._call(name, attr, args, kwargs)
+            with self._lock:
+                future = self._in_flight.get(key)
+                owner = future is None
+                if owner:
+                    future = self._in_flight[key] = Future()
+            if not owner:
+                return future.result()
+            try:
+                future.set_result(self._call(name, attr, args, kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+            return future.result()
+
+        call.__name__ = name
+        return call
+
+    def schedule(self, name, function, *args, **kwargs):
+        """Run `function` under the weight of endpoint `name`, for requests made outside the client methods."""
+        return self._call(name, function, args, kwargs)
+
+    def _call(self, name, method, args, kwargs):
+        self._bucket.acquire(request_weight(name, args, kwargs), order=name in ORDER_METHODS)
+        try:
+            return method(*args, **kwargs)
+        except BinanceAPIException as e:
+            if e.status_code in (418, 429):
+                retry_after = e.response.headers.get('Retry-After') if e.response is not None else None
+                self._bucket.block(float(retry_after) if retry_after else 60)
+            raise
+        finally:
+            self._sync_used_weight()
+
+    def _sync_used_weight(self):
+        response = getattr(self._client, 'response', None)
+        if response is None:
+            return
+        used = response.headers.get('x-mbx-used-weight-1m')
+        if used is not None:
+            self._bucket.sync(int(used))
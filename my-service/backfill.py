@@ -0,0 +1,266 @@
+"""Backfill kline history into the KlineStore with many requests in flight.
+
+A (symbols x date range) job is split into 1000-candle chunks. The chunks
+are fetched on a thread pool through RateLimitedClient, so the pool never
+goes past the request-weight budget. Chunks after the last stored candle are
+appended in order as they complete. The store is append-only and crash-safe,
+so it is its own checkpoint: an interrupted run resumes from whatever was
+written. Holes found before or inside the stored range are fetched too and
+merged in by rewriting the series.
+
+Binance has real gaps (exchange maintenance, late listings). A chunk that
+comes back short is retried once. Candles still missing after that are
+recorded in `<root>/backfill.json` and are not asked for again.
+
+Failed requests are retried with exponential backoff and full jitter, up to
+FETCH_ATTEMPTS times: rate limits (429/418), Binance 5xx and network errors
+or timeouts. After a 429 or 418 the scheduler keeps the weight bucket closed
+until Retry-After has passed, so the retry waits for that as well. Other
+errors, such as an unknown symbol, end the run.
+
+    python backfill.py --symbols BTCUSDT,ETHUSDT --start "1 Jan, 2023" --end "1 Jan, 2024"
+"""
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import requests
+from binance.exceptions import BinanceAPIException
+from binance.helpers import convert_ts_str, interval_to_milliseconds
+
+from api_scheduler import RateLimitedClient
+from kline_parser import fetch_klines
+from kline_store import COLUMNS, KlineStore
+
+CHUNK_CANDLES = 1000  # get_klines maximum, weight 2 whatever the limit
+CHECKPOINT_FILE = 'backfill.json'
+FIELDS = tuple(COLUMNS)
+FETCH_ATTEMPTS = 6
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+
+def retryable(error):
+    """Whether a failed kline request is worth another try."""
+    if isinstance(error, BinanceAPIException):
+        return error.status_code in (418, 429) or error.status_code >= 500
+    return isinstance(error, requests.RequestException)
+
+
+def missing_ranges(open_times, start, end, interval_ms):
+    """Half-open [from, to) open-time ranges inside [start, end) with no stored candle."""
+    if start >= end:
+        return []
+    if not len(open_times):
+        return [(start, end)]
+    ranges = []
+    first, last = int(open_times[0]), int(open_times[-1])
+    if start < first:
+        ranges.append((start, min(first, end)))
+    for i in np.flatnonzero(np.diff(open_times) > interval_ms):
+        low, high = max(int(open_times[i]) + interval_ms, start), min(int(open_times[i + 1]), end)
+        if low < high:
+            ranges.append((low, high))
+    if last + interval_ms < end:
+        ranges.append((max(last + interval_ms, start), end))
+    return ranges
+
+
+def subtract_ranges(ranges, gaps):
+    """`ranges` with the known `gaps` taken out, both as sorted half-open ranges."""
+    result = []
+    for low, high in ranges:
+        for gap_low, gap_high in gaps:
+            if gap_high <= low or gap_low >= high:
+                continue
+            if gap_low > low:
+                result.append((low, gap_low))
+            low = max(low, gap_high)
+            if low >= high:
+                break
+        if low < high:
+            result.append((low, high))
+    return result
+
+
+def merge_columns(parts):
+    """Concatenate column dicts into one sorted by open time, dropping duplicate candles."""
+    merged = {name: np.concatenate([np.asarray(part[name]) for part in parts]) for name in FIELDS}
+    _, first = np.unique(merged['open_time'], return_index=True)
+    return {name: values[first] for name, values in merged.items()}
+
+
+class _SeriesJob:
+    def __init__(self, symbol, series, chunks, append_from):
+        self.symbol = symbol
+        self.series = series
+        self.chunks = chunks
+        self.append_from = append_from  # first chunk index that extends the stored series
+        self.remaining = len(chunks)
+        self.next_append = append_from
+        self.pending = {}
+        self.patches = []
+        self.gaps = []
+        self.written = 0
+
+
+class Backfill:
+    def __init__(self, client, store=None, interval='1m', workers=8):
+        self.client = client if isinstance(client, RateLimitedClient) else RateLimitedClient(client)
+        self.store = store or KlineStore()
+        self.interval = interval
+        self.interval_ms = interval_to_milliseconds(interval)
+        self.workers = workers
+        self.checkpoint_path = os.path.join(self.store.root, CHECKPOINT_FILE)
+        self.checkpoint = self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_checkpoint(self):
+        os.makedirs(self.store.root, exist_ok=True)
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.checkpoint, f, indent=1)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _state(self, symbol):
+        return self.checkpoint.setdefault(f"{symbol}/{self.interval}", {'listed': None, 'gaps': []})
+
+    def _listed(self, symbol):
+        """Open time of the first candle Binance has for the symbol, or None."""
+        state = self._state(symbol)
+        if state['listed'] is None:
+            first = self.client.get_klines(symbol=symbol, interval=self.interval, startTime=0, limit=1)
+            if not first:
+                return None
+            state['listed'] = first[0][0]
+        return state['listed']
+
+    def plan(self, symbol, start, end):
+        """Chunks still to fetch for one symbol, or None when there is nothing to do."""
+        listed = self._listed(symbol)
+        if listed is None:
+            print(f"{symbol}: no klines on Binance")
+            return None
+        start = max(start // self.interval_ms * self.interval_ms, listed)
+        series = self.store.series(symbol, self.interval)
+        ranges = missing_ranges(series.column('open_time'), start, end, self.interval_ms)
+        ranges = subtract_ranges(ranges, [tuple(gap) for gap in self._state(symbol)['gaps']])
+
+        step = CHUNK_CANDLES * self.interval_ms
+        chunks = [(low, min(low + step, high)) for range_low, high in ranges
+                  for low in range(range_low, high, step)]
+        if not chunks:
+            return None
+        last = series.last_open_time
+        append_from = next((i for i, (low, _) in enumerate(chunks) if last is None or low > last), len(chunks))
+        return _SeriesJob(symbol, series, chunks, append_from)
+
+    def fetch_chunk(self, symbol, start, end):
+        """Columns of the candles opening in [start, end). A short answer is retried once."""
+        expected = (end - start) // self.interval_ms
+        for _ in range(2):
+            columns = self._fetch(symbol, start, end)
+            if len(columns['open_time']) >= expected:
+                break
+        return columns
+
+    def _fetch(self, symbol, start, end):
+        for attempt in range(FETCH_ATTEMPTS):
+            try:
+                return self.client.schedule('get_klines', fetch_klines, self.client._client, symbol,
+                                            self.interval, FIELDS, startTime=start, endTime=end - 1,
+                                            limit=CHUNK_CANDLES)
+            except Exception as e:
+                if attempt == FETCH_ATTEMPTS - 1 or not retryable(e):
+                    raise
+                # A 429/418 has also blocked the bucket, so schedule() then waits out Retry-After
+                time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+
+    def _completed(self, job, index, columns):
+        """Store a finished chunk. Returns True once the whole series is done."""
+        low, high = job.chunks[index]
+        job.gaps.extend(missing_ranges(columns['open_time'], low, high, self.interval_ms))
+        if index < job.append_from:
+            job.patches.append(columns)
+        else:
+            job.pending[index] = columns
+            while job.next_append in job.pending:
+                job.written += job.series.append(job.pending.pop(job.next_append))
+                job.next_append += 1
+        job.remaining -= 1
+        return job.remaining == 0
+
+    def _finish(self, job):
+        if job.patches:
+            existing = {name: np.array(values) for name, values in job.series.slice().items()}
+            merged = merge_columns([existing] + job.patches)
+            job.written += len(merged['open_time']) - len(existing['open_time'])
+            job.series = self.store.replace(job.symbol, self.interval, merged)
+        state = self._state(job.symbol)
+        state['gaps'] = sorted(state['gaps'] + [list(gap) for gap in job.gaps])
+        self._save_checkpoint()
+        missing = sum((high - low) // self.interval_ms for low, high in job.gaps)
+        print(f"{job.symbol}: +{job.written} candles, {len(job.series)} stored, {missing} missing on Binance")
+
+    def run(self, symbols, start, end=None):
+        """Backfill every symbol over [start, end) (ms timestamps, end defaults to now)."""
+        end = end or int(time.time() * 1000)
+        end = end // self.interval_ms * self.interval_ms  # closed candles only
+
+        def tasks():
+            for symbol in symbols:
+                job = self.plan(symbol, start, end)
+                if job is None:
+                    self._save_checkpoint()
+                    continue
+                for index, (low, high) in enumerate(job.chunks):
+                    yield job, index, low, high
+
+        queue = tasks()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                # Keep a bounded window of chunks in flight so out-of-order results stay small
+                for job, index, low, high in queue:
+                    in_flight[pool.submit(self.fetch_chunk, job.symbol, low, high)] = (job, index)
+                    if len(in_flight) >= self.workers * 2:
+                        break
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, index = in_flight.pop(future)
+                    if self._completed(job, index, future.result()):
+                        self._finish(job)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from binance.client import Client
+    from kline_store import KLINE_STORE_DIR
+
+    parser = argparse.ArgumentParser(description="Backfill kline history into the local kline store")
+    parser.add_argument("--symbols", required=True, help="comma separated, e.g. BTCUSDT,ETHUSDT")
+    parser.add_argument("--start", required=True, help='ms timestamp or date string, e.g. "1 Jan, 2023"')
+    parser.add_argument("--end", help="defaults to now")
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--root", default=KLINE_STORE_DIR)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    client = Client(os.environ.get('BINANCE_API_KEY'), os.environ.get('BINANCE_API_SECRET'))
+    started = time.time()
+    Backfill(client, KlineStore(args.root), args.interval, args.workers).run(
+        [s.strip() for s in args.symbols.split(',') if s.strip()],
+        convert_ts_str(args.start), convert_ts_str(args.end) if args.end else None)
+    print(f"done in {time.time() - started:.1f}s")
@@ -0,0 +1,183 @@
+"""Backtest the execute_trade strategy on recorded 1m klines.
+
+The live handler stores the ticker price on every tick and reads it back on
+the next one, so the stop-loss/take-profit check compares each price with the
+previous tick's. Under that rule the only path-dependent state is the
+position, and `simulate` jumps straight from one position change to the next
+using precomputed buy/sell signal arrays. The loop runs once per trade, not
+once per candle.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import batch_indicators
+from indicators import IndicatorEngine, Rsi, Sma
+from kline_parser import parse_kline_payload
+from strategy import StrategyParams, decide_trade
+
+DEFAULT_PARAMS = StrategyParams(rsi_period=14, rsi_overbought=80, rsi_oversold=20, stop_loss=0.0015,
+                                take_profit=0.001, short_window=5, long_window=20)
+
+BUY = 1
+SELL = -1
+
+TRADE_DTYPE = np.dtype([('open_time', np.int64), ('action', np.int8),
+                        ('price', np.float64), ('accumulated_gain', np.float64)])
+
+BacktestResult = namedtuple('BacktestResult', ['trades', 'accumulated_gain'])
+
+
+def load_klines(path):
+    """Read a JSON list of Binance klines and return (open_times, closes)."""
+    with open(path, 'rb') as f:
+        columns = parse_kline_payload(f.read(), ('open_time', 'close'))
+    return columns['open_time'], columns['close']
+
+
+def load_store(symbol, interval='1m', start_time=None, end_time=None, root=None):
+    """Read (open_times, closes) from the memory-mapped kline store without copying."""
+    from kline_store import KlineStore
+
+    store = KlineStore(root) if root else KlineStore()
+    columns = store.series(symbol, interval).slice(start_time, end_time)
+    return columns['open_time'], columns['close']
+
+
+def _next_true(mask):
+    """For every index, the first index at or after it where `mask` is True (len(mask) if none)."""
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    return np.minimum.accumulate(idx[::-1])[::-1]
+
+
+def first_decision_index(params):
+    return max(params.rsi_period, params.long_window - 1, params.short_window - 1)
+
+
+def simulate(open_times, closes, params=DEFAULT_PARAMS, rsi=None, short_ma=None, long_ma=None):
+    """Run the strategy over 1-D close prices.
+
+    The indicator series may be passed in precomputed, which lets parameter
+    sweeps reuse them across combinations that share a period.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    n = len(closes)
+    start = first_decision_index(params)
+    if rsi is None:
+        rsi = batch_indicators.rsi(closes, params.rsi_period)
+    if short_ma is None:
+        short_ma = batch_indicators.sma(closes, params.short_window)
+    if long_ma is None:
+        long_ma = batch_indicators.sma(closes, params.long_window)
+
+    pct = np.zeros(n)
+    pct[1:] = np.diff(closes) / closes[:-1]
+    if start < n:
+        pct[start] = 0  # the first decision has no previous tick to compare with
+
+    live = np.arange(n) >= start
+    with np.errstate(invalid='ignore'):
+        rsi_buy = live & (rsi < params.rsi_oversold)
+        buy_signal = rsi_buy | (live & (short_ma > long_ma))
+        sell_signal = live & ((rsi > params.rsi_overbought) | (pct <= -params.stop_loss)
+                              | (pct >= params.take_profit) | (short_ma < long_ma))
+
+    next_buy = _next_true(buy_signal)
+    next_sell = _next_true(sell_signal)
+
+    events = []
+    t, holding = start, False
+    while t < n:
+        t = next_sell[t] if holding else next_buy[t]
+        if t >= n:
+            break
+        events.append(t)
+        holding = not holding
+        t += 1
+
+    events = np.asarray(events, dtype=np.int64)
+    actions = np.where(np.arange(len(events)) % 2 == 0, BUY, SELL).astype(np.int8)
+
+    # Only RSI-triggered buys are charged to the gain; every sell credits the last tick's move
+    gain_delta = np.zeros(n)
+    buys = events[actions == BUY]
+    sells = events[actions == SELL]
+    gain_delta[buys] = np.where(rsi_buy[buys], -closes[buys], 0.0)
+    gain_delta[sells] = closes[sells] - closes[sells - 1]
+    accumulated_gain = np.cumsum(gain_delta)
+
+    trades = np.empty(len(events), dtype=TRADE_DTYPE)
+    trades['open_time'] = np.asarray(open_times)[events]
+    trades['action'] = actions
+    trades['price'] = closes[events]
+    trades['accumulated_gain'] = accumulated_gain[events]
+    return BacktestResult(trades, accumulated_gain)
+
+
+def simulate_reference(open_times, closes, params=DEFAULT_PARAMS):
+    """Candle-by-candle port of execute_trade, used to check `simulate`."""
+    engine = IndicatorEngine({"rsi": Rsi(params.rsi_period), "short_ma": Sma(params.short_window),
+                              "long_ma": Sma(params.long_window)})
+    position, last_price, gain = "NEUTRAL", None, 0.0
+    trades = []
+    curve = np.zeros(len(closes))
+    for i, (open_time, close) in enumerate(zip(np.asarray(open_times).tolist(), np.asarray(closes).tolist())):
+        engine.update(open_time, close, close, close)
+        if engine.ready:
+            action, position, _, gain = decide_trade(params, position, last_price, gain, close,
+                                                     engine["rsi"], engine["short_ma"], engine["long_ma"])
+            last_price = close  # the next tick reads back the price stored by this one
+            if action != "HOLD":
+                trades.append((open_time, BUY if action == "BUY" else SELL, close, gain))
+        curve[i] = gain
+    return BacktestResult(np.array(trades, dtype=TRADE_DTYPE), curve)
+
+
+def write_trade_log(path, trades):
+    with open(path, 'w') as f:
+        f.write("open_time,action,price,accumulated_gain\n")
+        for open_time, action, price, gain in trades.tolist():
+            f.write(f"{open_time},{'BUY' if action == BUY else 'SELL'},{price},{gain}\n")
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Backtest the RSI + MA-crossover strategy")
+    parser.add_argument("--klines", help="JSON list of 1m klines; random-walk prices when omitted")
+    parser.add_argument("--store", help="kline store directory to read --symbol from instead")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--trades", help="write the trade log to this CSV file")
+    parser.add_argument("--check", action="store_true", help="compare with the candle-by-candle port")
+    for name, value in DEFAULT_PARAMS._asdict().items():
+        parser.add_argument("--" + name.replace('_', '-'), type=type(value), default=value)
+    args = parser.parse_args()
+    params = StrategyParams(**{name: getattr(args, name) for name in StrategyParams._fields})
+
+    if args.store:
+        open_times, closes = load_store(args.symbol, root=args.store)
+    elif args.klines:
+        open_times, closes = load_klines(args.klines)
+    else:
+        minutes = 365 * 24 * 60
+        rng = np.random.default_rng(0)
+        open_times = np.arange(minutes, dtype=np.int64) * 60000
+        closes = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0008, minutes)))
+
+    started = time.perf_counter()
+    result = simulate(open_times, closes, params)
+    elapsed = time.perf_counter() - started
+    print(f"{len(closes)} candles, {len(result.trades)} trades in {elapsed:.2f}s")
+    print(f"accumulated gain: {result.accumulated_gain[-1]:.4f}")
+
+    if args.trades:
+        write_trade_log(args.trades, result.trades)
+    if args.check:
+        started = time.perf_counter()
+        reference = simulate_reference(open_times, closes, params)
+        print(f"candle-by-candle port: {time.perf_counter() - started:.2f}s")
+        assert np.array_equal(reference.trades[['open_time', 'action']], result.trades[['open_time', 'action']])
+        assert np.allclose(reference.accumulated_gain, result.accumulated_gain)
+        print("trade logs match")
@@ -0,0 +1,139 @@
+"""Vectorised indicators over 2-D close arrays shaped (symbols, time).
+
+Every function matches the streaming classes in indicators.py value for value:
+NaN until the indicator is warm, then the same number the streaming version
+reports after that candle. Recursive indicators (EMA, Wilder RSI) loop over
+time only, with each step vectorised across all symbols.
+"""
+import numpy as np
+
+
+def sma(close, window):
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(close.shape, np.nan)
+    if close.shape[-1] < window:
+        return out
+    csum = np.cumsum(close, axis=-1)
+    out[..., window - 1] = csum[..., window - 1]
+    out[..., window:] = csum[..., window:] - csum[..., :-window]
+    out[..., window - 1:] /= window
+    return out
+
+
+def ema(close, period):
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(close.shape, np.nan)
+    length = close.shape[-1]
+    if length < period:
+        return out
+    alpha = 2.0 / (period + 1)
+    close_t = np.moveaxis(close, -1, 0)
+    out_t = np.moveaxis(out, -1, 0)
+    current = close_t[:period].mean(axis=0)
+    out_t[period - 1] = current
+    for t in range(period, length):
+        current = current + alpha * (close_t[t] - current)
+        out_t[t] = current
+    return out
+
+
+def rsi(close, period):
+    """Wilder RSI, the same as indicators.Rsi."""
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(close.shape, np.nan)
+    length = close.shape[-1]
+    if length <= period:
+        return out
+    delta = np.diff(close, axis=-1)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+
+    # Time-major copies so every step of the recursion reads contiguous memory
+    gain_t = np.ascontiguousarray(np.moveaxis(gain, -1, 0))
+    loss_t = np.ascontiguousarray(np.moveaxis(loss, -1, 0))
+    avg_gain = np.empty(gain_t.shape)
+    avg_loss = np.empty(loss_t.shape)
+    avg_gain[period - 1] = gain_t[:period].mean(axis=0)
+    avg_loss[period - 1] = loss_t[:period].mean(axis=0)
+    for t in range(period, length - 1):
+        avg_gain[t] = (avg_gain[t - 1] * (period - 1) + gain_t[t]) / period
+        avg_loss[t] = (avg_loss[t - 1] * (period - 1) + loss_t[t]) / period
+
+    g = np.moveaxis(avg_gain[period - 1:], 0, -1)
+    l = np.moveaxis(avg_loss[period - 1:], 0, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - 100 / (1 + g / l)
+    values = np.where(l == 0, np.where(g > 0, 100.0, 50.0), values)
+    out[..., period:] = values
+    return out
+
+
+MOVING_AVERAGES = {'sma': sma, 'ema': ema}
+
+
+def ma_crossover(close, short_window, long_window, kind='sma'):
+    """+1 where the short MA is above the long MA, -1 where below, 0 otherwise or while warming up.
+
+    `kind` is 'sma' or 'ema', matching indicators.Sma or indicators.Ema.
+    """
+    if kind not in MOVING_AVERAGES:
+        raise ValueError(f"Unknown moving average {kind!r}, expected one of {', '.join(MOVING_AVERAGES)}")
+    average = MOVING_AVERAGES[kind]
+    diff = average(close, short_window) - average(close, long_window)
+    out = np.zeros(diff.shape, dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        out[diff > 0] = 1
+        out[diff < 0] = -1
+    return out
+
+
+def rsi_zones(values, overbought, oversold):
+    """Boolean (overbought, oversold) masks; NaN counts as neither."""
+    with np.errstate(invalid='ignore'):
+        return values > overbought, values < oversold
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from indicators import IndicatorEngine, Rsi, Sma
+
+    parser = argparse.ArgumentParser(description="Benchmark vectorised vs streaming indicators")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--candles", type=int, default=10000)
+    parser.add_argument("--scalar-symbols", type=int, default=20,
+                        help="symbols run through the streaming engine; the total is extrapolated")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, (args.symbols, args.candles)), axis=1))
+
+    started = time.perf_counter()
+    batch_rsi = rsi(closes, 14)
+    crossover = ma_crossover(closes, 5, 20)
+    overbought, oversold = rsi_zones(batch_rsi, 80, 20)
+    vector_seconds = time.perf_counter() - started
+
+    scalar_symbols = min(args.scalar_symbols, args.symbols)
+    started = time.perf_counter()
+    scalar = []
+    for s in range(scalar_symbols):
+        engine = IndicatorEngine({"rsi": Rsi(14), "short_ma": Sma(5), "long_ma": Sma(20)})
+        values = []
+        for t, close in enumerate(closes[s].tolist()):
+            engine.update(t, close, close, close)
+            if engine.ready:
+                values.append((t, engine["rsi"], engine["short_ma"] - engine["long_ma"]))
+        scalar.append(values)
+    scalar_seconds = (time.perf_counter() - started) * args.symbols / scalar_symbols
+
+    for s, values in enumerate(scalar):
+        for t, value, diff in values:
+            assert abs(value - batch_rsi[s, t]) < 1e-6
+            assert abs(diff) < 1e-9 or (diff > 0) == (crossover[s, t] == 1)
+
+    print(f"{args.symbols} symbols x {args.candles} candles")
+    print(f"vectorised: {vector_seconds:.3f}s")
+    print(f"streaming:  {scalar_seconds:.3f}s (extrapolated from {scalar_symbols} symbols)")
+    print(f"speed-up:   {scalar_seconds / vector_seconds:.1f}x")
@@ -1,20 +1,46 @@
+import json
 import os
-import boto3
-from binance.client import Client
-from binance.exceptions import BinanceAPIException
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+import threading
 import time
 
+# boto3 and python-binance are imported on first use, see get_client/get_table
+from indicators import IndicatorEngine, Rsi, Sma
+from latency import LatencyRecorder
+from state_writer import CONDITION_FAILED, StateWriter, batch_get_items
+from strategy import StrategyParams, decide_trade
+
 # Load your Binance API keys from Lambda's environment variables
 BINANCE_API_KEY = os.environ.get('BINANCE_API_KEY')
 BINANCE_API_SECRET = os.environ.get('BINANCE_API_SECRET')
 
-# Initialize the Binance client
-client = Client(BINANCE_API_KEY, BINANCE_API_SECRET)
+# Symbols traded on each invocation and how many are processed at once
+SYMBOLS = [s.strip() for s in os.environ.get('SYMBOLS', 'BTCUSDT').split(',') if s.strip()]
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '16'))
+
+# Table holding one item per symbol with its latest state; empty to read the history table instead
+LATEST_TABLE_NAME = os.environ.get('LATEST_TABLE_NAME', 'TradingStateLatest')
+
+# 'changes' writes history items only on trades, position or gain changes and heartbeats;
+# 'every_tick' writes one per tick. Keep the heartbeat shorter than KLINE_LOOKBACK minutes
+# so the stored indicator state can always be advanced rather than rebuilt.
+PERSIST_MODE = os.environ.get('PERSIST_MODE', 'changes')
+HEARTBEAT_SECONDS = int(os.environ.get('HEARTBEAT_SECONDS', '900'))
 
-# Initialize the DynamoDB client and table
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('TradingState')
+# Set to 1 to build the clients during the init phase (e.g. with provisioned concurrency)
+EAGER_INIT = os.environ.get('EAGER_INIT') == '1'
+
+# Clients are created on first use and reused by every warm invocation of the container
+client = None
+kline_cache = None
+dynamodb = None
+table = None
+latest_table = None
+_init_lock = threading.Lock()
+
+# Stage timings of every tick, kept for the life of the container
+latency = LatencyRecorder()
 
 # Constants
 RSI_PERIOD = 14
@@ -25,122 +51,330 @@ TAKE_PROFIT = 0.001  # e.g., 0.1% profit
 
 SHORT_WINDOW = 5  # e.g., 5-minute MA
 LONG_WINDOW = 20  # e.g., 20-minute MA
+KLINE_LOOKBACK = 30  # minutes of 1m candles fed to the indicators
+KLINE_INTERVAL = '1m'
+INTERVAL_MS = 60 * 1000
+
+STRATEGY_PARAMS = StrategyParams(RSI_PERIOD, RSI_OVERBOUGHT, RSI_OVERSOLD, STOP_LOSS,
+                                 TAKE_PROFIT, SHORT_WINDOW, LONG_WINDOW)
+
+def get_client():
+    """Binance client scheduled by request weight, shared by all worker threads."""
+    global client, kline_cache
+    if client is None:
+        with _init_lock:
+            if client is None:
+                from binance.client import Client
+                from requests.adapters import HTTPAdapter
+                from api_scheduler import RateLimitedClient
+                from kline_cache import KlineCache
+
+                binance_client = RateLimitedClient(Client(BINANCE_API_KEY, BINANCE_API_SECRET))
+                # Let every worker thread keep its own pooled connection to the shared session
+                binance_client.session.mount('https://', HTTPAdapter(pool_connections=MAX_WORKERS,
+                                                                     pool_maxsize=MAX_WORKERS))
+                kline_cache = KlineCache(binance_client)
+                client = binance_client
+    return client
+
+def get_kline_cache():
+    get_client()
+    return kline_cache
+
+def get_table():
+    """The TradingState table on a DynamoDB resource shared by all worker threads."""
+    global dynamodb, table, latest_table
+    if table is None:
+        with _init_lock:
+            if table is None:
+                import boto3
+
+                dynamodb = boto3.resource('dynamodb')
+                if LATEST_TABLE_NAME:
+                    latest_table = dynamodb.Table(LATEST_TABLE_NAME)
+                table = dynamodb.Table('TradingState')
+    return table
 
-def save_state_to_dynamodb(symbol, trade_data):
-    """Saves trade data to DynamoDB."""
+def get_latest_table():
+    get_table()
+    return latest_table
+
+# Latest trade state per symbol, written through on save and reused while the container is
+# warm. Writes to the latest-state table are conditional on the cached `version`, so a state
+# changed by another invocation is caught at the next write instead of by a read every tick.
+_state_cache = {}
+_state_lock = threading.Lock()
+
+def persistence_plan(last_trade, trade_data, now):
+    """(write_history, write_latest) for a tick's state under PERSIST_MODE.
+
+    A HOLD that changes nothing is not history. While LONG, the latest state
+    is still refreshed every tick because the next stop-loss and take-profit
+    checks compare against this tick's price. While NEUTRAL, decisions do not
+    depend on the stored price, so the state can wait for the next heartbeat.
+    """
+    if PERSIST_MODE == 'every_tick' or not last_trade:
+        return True, True
+    changed = (trade_data["action"] != "HOLD"
+               or trade_data["position"] != last_trade.get('position')
+               or trade_data["accumulated_gain"] != Decimal(last_trade.get('accumulated_gain', '0')))
+    last_history = last_trade.get('history_timestamp', last_trade['timestamp'])
+    heartbeat = now - last_history >= HEARTBEAT_SECONDS * 1000
+    needs_price = trade_data["position"] == "LONG"
+    history = changed or heartbeat or (needs_price and not LATEST_TABLE_NAME)
+    return history, history or needs_price
+
+class StaleState(Exception):
+    """The latest state was changed by another invocation since it was read."""
+
+STALE_STATE_ERROR = "state changed by another invocation, reloading"
+
+def latest_condition(version):
+    """Condition for a latest-state write replacing the stored `version` (None: no versioned item yet)."""
+    if version is None:
+        return 'attribute_not_exists(#v)', {'#v': 'version'}, None
+    return '#v = :v', {'#v': 'version'}, {':v': version}
+
+def new_state_writer():
+    get_table()
+    return StateWriter(dynamodb.meta.client, max_workers=MAX_WORKERS, latest_table_name=LATEST_TABLE_NAME or None)
+
+def save_state_to_dynamodb(symbol, trade_data, writer=None, history=True, latest=True, last_trade=None):
+    """Saves trade data to DynamoDB, or queues it on `writer` to go out with the rest of the tick.
+
+    `history` and `latest` choose the tables. A state written to neither is
+    only kept in the warm cache. Without `writer` the state is written at
+    once, and a state changed elsewhere since `last_trade` raises StaleState.
+    """
     trade_data['symbol'] = symbol
     trade_data['timestamp'] = int(time.time() * 1000)  # current time in milliseconds
-    table.put_item(Item=trade_data)
+    if history:
+        trade_data['history_timestamp'] = trade_data['timestamp']
+    elif last_trade:
+        trade_data['history_timestamp'] = last_trade.get('history_timestamp', last_trade['timestamp'])
+    latest = latest and bool(LATEST_TABLE_NAME)
+    version = last_trade.get('version') if last_trade else None
+    if latest:
+        trade_data['version'] = (version or 0) + 1
+    elif version is not None:
+        trade_data['version'] = version  # still the stored one
+    tables = (['TradingState'] if history else []) + ([LATEST_TABLE_NAME] if latest else [])
+    if not tables:
+        remember_state(symbol, trade_data)
+        return
+    conditions = {LATEST_TABLE_NAME: latest_condition(version)} if latest else None
+    if writer is not None:
+        writer.add(trade_data, tables, conditions)
+        return
+    writer = new_state_writer()
+    writer.add(trade_data, tables, conditions)
+    for item, error in writer.flush():
+        error = settle_state(item, error)
+        if error:
+            raise StaleState(error) if error == STALE_STATE_ERROR else RuntimeError(error)
+
+def settle_state(item, error):
+    """Apply the outcome of a state write to the cache. Returns the error to report, or None."""
+    if error is None:
+        remember_state(item['symbol'], item)
+        return None
+    if error == CONDITION_FAILED:
+        forget_state(item['symbol'])  # the next read fetches the newer state
+        return STALE_STATE_ERROR
+    return error
+
+def remember_state(symbol, trade_data):
+    with _state_lock:
+        _state_cache[symbol] = dict(trade_data)
+
+def forget_state(symbol):
+    with _state_lock:
+        _state_cache.pop(symbol, None)
 
 def get_last_trade_from_dynamodb(symbol):
-    """Retrieve the latest trade data from DynamoDB for a particular symbol."""
-    response = table.query(
+    """Latest state of `symbol`: from the warm cache, the latest-state table or the newest history item."""
+    if LATEST_TABLE_NAME:
+        with _state_lock:
+            cached = _state_cache.get(symbol)
+        if cached is not None:
+            return dict(cached)  # no read: the versioned write catches a state changed elsewhere
+        # One fixed-key read, however long the symbol's history has grown
+        item = get_latest_table().get_item(Key={'symbol': symbol}).get('Item')
+        if item:
+            remember_state(symbol, item)
+            return item
+
+    # No latest-state table, or no item in it yet (e.g. written before the table existed)
+    response = get_table().query(
         KeyConditionExpression='symbol = :symbol_val',
         ExpressionAttributeValues={':symbol_val': symbol},
         Limit=1,
         ScanIndexForward=False  # to get the latest (descending order by timestamp)
     )
     if 'Items' in response and response['Items']:
-        return response['Items'][0]
+        item = response['Items'][0]
+        item.pop('version', None)  # versions belong to the latest-state item, which is missing
+        if LATEST_TABLE_NAME:
+            remember_state(symbol, item)
+        return item
     return None
 
-def calculate_rsi(prices, period):
-    """Calculate the RSI based on closing prices and period."""
-    deltas = [prices[i+1] - prices[i] for i in range(len(prices)-1)]
-    gains = [delta for delta in deltas if delta > 0]
-    losses = [-delta for delta in deltas if delta < 0]
+def prefetch_latest_states(symbols):
+    """Load, with BatchGetItem, the state of every symbol not in the warm cache yet."""
+    with _state_lock:
+        missing = [s for s in symbols if s not in _state_cache]
+    if not missing or not LATEST_TABLE_NAME:
+        return
+    get_table()
+    for item in batch_get_items(dynamodb.meta.client, LATEST_TABLE_NAME, [{'symbol': s} for s in missing]):
+        remember_state(item['symbol'], item)
 
-    avg_gain = sum(gains[-period:]) / period
-    avg_loss = -sum(losses[-period:]) / period
-    rs = avg_gain / avg_loss if avg_loss != 0 else 0
+def new_indicator_engine():
+    return IndicatorEngine({
+        "rsi": Rsi(RSI_PERIOD),
+        "short_ma": Sma(SHORT_WINDOW),
+        "long_ma": Sma(LONG_WINDOW),
+    })
 
-    return 100 - (100 / (1 + rs))
+def update_indicators(last_trade, klines):
+    """Advance the persisted indicator state with the candles closed since the last tick.
 
-def execute_trade(symbol="BTCUSDT"):
-    try:
-        klines = client.get_historical_klines(symbol, Client.KLINE_INTERVAL_1MINUTE, "30 minutes ago UTC")
-        if not klines:
-            return
+    Falls back to rebuilding from the kline window on a cold start or when
+    candles were missed since the state was saved.
+    """
+    now = int(time.time() * 1000)
+    closed = [k for k in klines if k[6] < now]
 
-        close_values = [float(k[4]) for k in klines]
-        rsi = calculate_rsi(close_values, RSI_PERIOD)
+    engine = None
+    if last_trade and last_trade.get('indicator_state'):
+        engine = IndicatorEngine.from_json(last_trade['indicator_state'])
+        newer = [k for k in closed if k[0] > engine.last_open_time]
+        if newer and newer[0][0] != engine.last_open_time + INTERVAL_MS:
+            engine = None  # gap since the state was saved
 
+    if engine is None:
+        engine = new_indicator_engine()
+    for k in closed:
+        engine.update_kline(k)
+    return engine
 
-        short_ma = sum(close_values[-SHORT_WINDOW:]) / SHORT_WINDOW
-        long_ma = sum(close_values[-LONG_WINDOW:]) / LONG_WINDOW
+def execute_trade(symbol="BTCUSDT", writer=None):
+    """One tick for `symbol`. Binance errors propagate so run_symbol reports them."""
+    with latency.stage('binance_klines'):
+        klines = get_kline_cache().get_klines(symbol, KLINE_INTERVAL, KLINE_LOOKBACK)
+    if not klines:
+        return
 
-        current_price = Decimal(client.get_symbol_ticker(symbol=symbol)["price"])
+    with latency.stage('state_read'):
         last_trade = get_last_trade_from_dynamodb(symbol)
-
-        position = "NEUTRAL"
-        last_trade_price = None  # Initialize to None
-        accumulated_gain = Decimal('0')
-
-        if last_trade:
-            position = last_trade.get('position')
-            last_trade_price = Decimal(last_trade.get('price', 0))
-            accumulated_gain = Decimal(last_trade.get('accumulated_gain', '0'))
-
-        trade_action = "HOLD"
-        percentage_change = (current_price - last_trade_price) / last_trade_price if last_trade_price else 0
-
-        # RSI based decision augmentation
-        if position == "LONG":
-            if rsi > RSI_OVERBOUGHT or percentage_change <= -STOP_LOSS or percentage_change >= TAKE_PROFIT:
-                trade_action = "SELL"
-                position = "NEUTRAL"
-                if last_trade_price:  # If a purchase price exists
-                    occurred_gain = current_price - last_trade_price
-                    accumulated_gain += occurred_gain
-
-        elif position == "NEUTRAL" and rsi < RSI_OVERSOLD:
-            trade_action = "BUY"
-            position = "LONG"
-            accumulated_gain -= current_price
-
-        if trade_action == "HOLD":
-            if short_ma > long_ma and position != "LONG":
-                trade_action = "BUY"
-                position = "LONG"
-                last_trade_price = current_price  # Store the purchase price for future calculations
-            elif short_ma < long_ma and position != "NEUTRAL":
-                trade_action = "SELL"
-                position = "NEUTRAL"
-                if last_trade_price:  # If a purchase price exists
-                    occurred_gain = current_price - last_trade_price
-                    accumulated_gain += occurred_gain
-
-        trade_data = {
-            "price": Decimal(str(current_price)),
-            "action": trade_action,
-            "position": position,
-            "accumulated_gain": accumulated_gain
-        }
-        if last_trade_price is not None:
-            trade_data["last_trade_price"] = last_trade_price  # Add the purchase price to DynamoDB
-
-        print(f"Current Price: {current_price}")
-        print(f"Short MA: {short_ma}")
-        print(f"Long MA: {long_ma}")
-        print(f"Action: {trade_action}")
-
-        save_state_to_dynamodb(symbol, trade_data)
-        return trade_data
-
-    except BinanceAPIException as e:
-        print(f"BinanceAPIException: {e}")
+    with latency.stage('indicators'):
+        indicators = update_indicators(last_trade, klines)
+    if not indicators.ready:
+        print(f"{symbol} Not enough candles to compute indicators")
         return None
 
+    rsi = indicators["rsi"]
+    short_ma = indicators["short_ma"]
+    long_ma = indicators["long_ma"]
+
+    with latency.stage('binance_ticker'):
+        current_price = Decimal(get_client().get_symbol_ticker(symbol=symbol)["price"])
+
+    position = "NEUTRAL"
+    last_trade_price = None  # Initialize to None
+    accumulated_gain = Decimal('0')
+
+    if last_trade:
+        position = last_trade.get('position')
+        last_trade_price = Decimal(last_trade.get('price', 0))
+        accumulated_gain = Decimal(last_trade.get('accumulated_gain', '0'))
+
+    with latency.stage('decision'):
+        trade_action, position, last_trade_price, accumulated_gain = decide_trade(
+            STRATEGY_PARAMS, position, last_trade_price, accumulated_gain,
+            current_price, rsi, short_ma, long_ma)
+    # Age of the newest closed candle the indicators saw
+    latency.data_age(indicators.last_open_time + INTERVAL_MS - 1)
+
+    trade_data = {
+        "price": Decimal(str(current_price)),
+        "action": trade_action,
+        "position": position,
+        "accumulated_gain": accumulated_gain,
+        "indicator_state": indicators.to_json()
+    }
+    if last_trade_price is not None:
+        trade_data["last_trade_price"] = last_trade_price  # Add the purchase price to DynamoDB
+
+    print(f"{symbol} Current Price: {current_price}, Short MA: {short_ma}, Long MA: {long_ma}, Action: {trade_action}")
+
+    history, latest = persistence_plan(last_trade, trade_data, int(time.time() * 1000))
+    with latency.stage('state_write'):
+        save_state_to_dynamodb(symbol, trade_data, writer, history, latest, last_trade)
+    return trade_data
+
+
+def run_symbol(symbol, writer=None):
+    """Run execute_trade for one symbol, timing it and isolating its failures."""
+    started = time.time()
+    report = {"symbol": symbol}
+    try:
+        with latency.tick(symbol):
+            result = execute_trade(symbol, writer)
+        if result:
+            report.update({
+                "action": result["action"],
+                "price": str(result["price"]),
+                "accumulated_gain": str(result["accumulated_gain"]),
+            })
+        else:
+            report["action"] = None
+    except Exception as e:
+        report["error"] = f"{type(e).__name__}: {e}"
+        print(f"{symbol} failed: {report['error']}")
+    report["elapsed_ms"] = round((time.time() - started) * 1000, 1)
+    return report
+
+
+def execute_trades(symbols):
+    """Run the per-symbol pipelines concurrently, then write all their states in batches."""
+    with latency.stage('state_prefetch'):
+        prefetch_latest_states(symbols)
+    if len(symbols) == 1:
+        return [run_symbol(symbols[0])]
+    writer = new_state_writer()
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(symbols))) as pool:
+        reports = list(pool.map(lambda symbol: run_symbol(symbol, writer), symbols))
+
+    with latency.stage('state_flush'):
+        outcomes = writer.flush()
+    by_symbol = {report["symbol"]: report for report in reports}
+    for item, error in outcomes:
+        error = settle_state(item, error)
+        if error:
+            print(f"{item['symbol']} state write failed: {error}")
+            by_symbol[item['symbol']]["error"] = f"state write failed: {error}"
+    return reports
+
 
 def lambda_handler(event, context):
-    result = execute_trade()
-    if result:
-        return {
-            'statusCode': 200,
-            'body': f"Trade executed with action {result['action']} for {str(result['price'])} with accumulated gain {str(result['accumulated_gain'])}."
-        }
-    else:
-        return {
-            'statusCode': 200,
-            'body': 'No trade executed.'
-        }
+    symbols = (event or {}).get('symbols') or SYMBOLS
+    started = time.time()
+    results = execute_trades(symbols)
+    latency.flush()
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'elapsed_ms': round((time.time() - started) * 1000, 1),
+            'succeeded': sum(1 for r in results if r.get('action') and 'error' not in r),
+            'failed': sum(1 for r in results if 'error' in r),
+            'results': results,
+            'latency': {name: {k: v for k, v in h.items() if k != 'buckets'}
+                        for name, h in latency.summary().items()},
+        })
+    }
+
+
+if EAGER_INIT:
+    get_client()
+    get_table()
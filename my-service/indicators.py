@@ -0,0 +1,281 @@
+import json
+import math
+from collections import deque
+
+
+class Sma:
+    """Simple moving average over the last `period` values."""
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+
+    def update(self, value):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(value)
+        self.total += value
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.window) < self.period:
+            return None
+        return self.total / self.period
+
+    def to_dict(self):
+        return {"period": self.period, "window": list(self.window)}
+
+    @classmethod
+    def from_dict(cls, state):
+        sma = cls(state["period"])
+        for value in state["window"]:
+            sma.update(value)
+        return sma
+
+
+class Ema:
+    """Exponential moving average, seeded with the SMA of the first `period` values."""
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.count = 0
+        self.current = 0.0
+
+    def update(self, value):
+        self.count += 1
+        if self.count <= self.period:
+            self.current += (value - self.current) / self.count  # running mean while seeding
+        else:
+            self.current += self.alpha * (value - self.current)
+        return self.value
+
+    @property
+    def value(self):
+        return self.current if self.count >= self.period else None
+
+    def to_dict(self):
+        return {"period": self.period, "count": self.count, "current": self.current}
+
+    @classmethod
+    def from_dict(cls, state):
+        ema = cls(state["period"])
+        ema.count = state["count"]
+        ema.current = state["current"]
+        return ema
+
+
+class Rsi:
+    """Relative strength index with Wilder smoothing."""
+
+    def __init__(self, period):
+        self.period = period
+        self.prev = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    def update(self, value):
+        if self.prev is not None:
+            delta = value - self.prev
+            gain = delta if delta > 0 else 0.0
+            loss = -delta if delta < 0 else 0.0
+            self.count += 1
+            if self.count <= self.period:
+                # The first average is a plain mean of `period` deltas
+                self.avg_gain += (gain - self.avg_gain) / self.count
+                self.avg_loss += (loss - self.avg_loss) / self.count
+            else:
+                self.avg_gain = (self.avg_gain * (self.period - 1) + gain) / self.period
+                self.avg_loss = (self.avg_loss * (self.period - 1) + loss) / self.period
+        self.prev = value
+        return self.value
+
+    @property
+    def value(self):
+        if self.count < self.period:
+            return None
+        if self.avg_loss == 0:
+            return 100.0 if self.avg_gain > 0 else 50.0
+        rs = self.avg_gain / self.avg_loss
+        return 100 - (100 / (1 + rs))
+
+    def to_dict(self):
+        return {"period": self.period, "prev": self.prev, "count": self.count,
+                "avg_gain": self.avg_gain, "avg_loss": self.avg_loss}
+
+    @classmethod
+    def from_dict(cls, state):
+        rsi = cls(state["period"])
+        rsi.prev = state["prev"]
+        rsi.count = state["count"]
+        rsi.avg_gain = state["avg_gain"]
+        rsi.avg_loss = state["avg_loss"]
+        return rsi
+
+
+class BollingerBands:
+    """Middle, upper and lower band from a running sum and sum of squares."""
+
+    def __init__(self, period=20, width=2.0):
+        self.period = period
+        self.width = width
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, value):
+        if len(self.window) == self.period:
+            old = self.window[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.window.append(value)
+        self.total += value
+        self.total_sq += value * value
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.window) < self.period:
+            return None
+        mean = self.total / self.period
+        std = math.sqrt(max(self.total_sq / self.period - mean * mean, 0.0))
+        return mean, mean + self.width * std, mean - self.width * std
+
+    def to_dict(self):
+        return {"period": self.period, "width": self.width, "window": list(self.window)}
+
+    @classmethod
+    def from_dict(cls, state):
+        bands = cls(state["period"], state["width"])
+        for value in state["window"]:
+            bands.update(value)
+        return bands
+
+
+class Atr:
+    """Average true range with Wilder smoothing. Fed with (high, low, close)."""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.count = 0
+        self.current = 0.0
+
+    def update(self, high, low, close):
+        if self.prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.count += 1
+        if self.count <= self.period:
+            self.current += (true_range - self.current) / self.count
+        else:
+            self.current = (self.current * (self.period - 1) + true_range) / self.period
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self):
+        return self.current if self.count >= self.period else None
+
+    def to_dict(self):
+        return {"period": self.period, "prev_close": self.prev_close,
+                "count": self.count, "current": self.current}
+
+    @classmethod
+    def from_dict(cls, state):
+        atr = cls(state["period"])
+        atr.prev_close = state["prev_close"]
+        atr.count = state["count"]
+        atr.current = state["current"]
+        return atr
+
+
+class Macd:
+    """MACD line, signal line and histogram."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = Ema(fast)
+        self.slow = Ema(slow)
+        self.signal = Ema(signal)
+
+    def update(self, value):
+        fast = self.fast.update(value)
+        slow = self.slow.update(value)
+        if fast is not None and slow is not None:
+            self.signal.update(fast - slow)
+        return self.value
+
+    @property
+    def value(self):
+        signal = self.signal.value
+        if signal is None:
+            return None
+        line = self.fast.value - self.slow.value
+        return line, signal, line - signal
+
+    def to_dict(self):
+        return {"fast": self.fast.to_dict(), "slow": self.slow.to_dict(), "signal": self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        macd = cls()
+        macd.fast = Ema.from_dict(state["fast"])
+        macd.slow = Ema.from_dict(state["slow"])
+        macd.signal = Ema.from_dict(state["signal"])
+        return macd
+
+
+INDICATOR_TYPES = {cls.__name__: cls for cls in (Sma, Ema, Rsi, BollingerBands, Atr, Macd)}
+
+
+class IndicatorEngine:
+    """Named indicators updated once per closed candle, in constant time.
+
+    The whole engine round-trips through `to_json`/`from_json` so it can be
+    stored next to the trade state and resumed on the next invocation.
+    """
+
+    def __init__(self, indicators, last_open_time=None):
+        self.indicators = indicators
+        self.last_open_time = last_open_time
+
+    def update(self, open_time, high, low, close):
+        """Feed one closed candle. Candles at or before `last_open_time` are ignored."""
+        if self.last_open_time is not None and open_time <= self.last_open_time:
+            return False
+        for indicator in self.indicators.values():
+            if isinstance(indicator, Atr):
+                indicator.update(high, low, close)
+            else:
+                indicator.update(close)
+        self.last_open_time = open_time
+        return True
+
+    def update_kline(self, kline):
+        """Feed one closed Binance kline (the raw 12-field list)."""
+        return self.update(kline[0], float(kline[2]), float(kline[3]), float(kline[4]))
+
+    def __getitem__(self, name):
+        return self.indicators[name].value
+
+    @property
+    def ready(self):
+        return all(indicator.value is not None for indicator in self.indicators.values())
+
+    def to_json(self):
+        return json.dumps({
+            "last_open_time": self.last_open_time,
+            "indicators": {name: [type(indicator).__name__, indicator.to_dict()]
+                           for name, indicator in self.indicators.items()},
+        })
+
+    @classmethod
+    def from_json(cls, data):
+        state = json.loads(data)
+        indicators = {name: INDICATOR_TYPES[kind].from_dict(values)
+                      for name, (kind, values) in state["indicators"].items()}
+        return cls(indicators, state["last_open_time"])
@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+import time
+
+from binance.helpers import interval_to_milliseconds
+
+# Lambda keeps /tmp between warm invocations of the same container
+KLINE_CACHE_DIR = os.environ.get('KLINE_CACHE_DIR', '/tmp/klines')
+MAX_CACHED_CANDLES = 1000  # one get_klines page
+
+
+class KlineCache:
+    """Rolling buffer of closed candles per (symbol, interval), persisted to disk.
+
+    Only candles newer than the last stored close time are requested from
+    Binance, so every call costs a single small request once the buffer is warm.
+    """
+
+    def __init__(self, client, cache_dir=KLINE_CACHE_DIR, max_candles=MAX_CACHED_CANDLES):
+        self.client = client
+        self.cache_dir = cache_dir
+        self.max_candles = max_candles
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, interval):
+        return os.path.join(self.cache_dir, f"{symbol}_{interval}.json")
+
+    def _load(self, symbol, interval):
+        key = (symbol, interval)
+        with self._lock:
+            if key in self._buffers:
+                return self._buffers[key]
+        try:
+            with open(self._path(symbol, interval)) as f:
+                candles = json.load(f)
+        except (OSError, ValueError):
+            candles = []
+        with self._lock:
+            return self._buffers.setdefault(key, candles)
+
+    def _save(self, symbol, interval, candles):
+        with self._lock:
+            self._buffers[(symbol, interval)] = candles
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(symbol, interval)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(candles, f)
+        os.replace(tmp_path, path)  # never leave a half-written buffer behind
+
+    def get_klines(self, symbol, interval, lookback):
+        """Return the last `lookback` candles, including the one still in progress.
+
+        The result has the same shape as `client.get_historical_klines`.
+        """
+        interval_ms = interval_to_milliseconds(interval)
+        now = int(time.time() * 1000)
+        window_start = now - lookback * interval_ms
+
+        candles = self._load(symbol, interval)
+        if candles and candles[-1][6] >= window_start:
+            # Warm buffer: only fetch what closed since the last stored candle
+            fresh = self.client.get_klines(symbol=symbol, interval=interval,
+                                           startTime=candles[-1][6] + 1, limit=1000)
+        else:
+            # Cold or stale buffer: refill the whole window
+            candles = []
+            fresh = self.client.get_historical_klines(symbol, interval, window_start)
+
+        closed = [k for k in fresh if k[6] < now]
+        in_progress = [k for k in fresh if k[6] >= now]
+
+        if closed:
+            last_open = candles[-1][0] if candles else None
+            merged = candles + [k for k in closed if last_open is None or k[0] > last_open]
+            candles = merged[-self.max_candles:]
+            self._save(symbol, interval, candles)
+
+        window = [k for k in candles if k[6] >= window_start] + in_progress
+        return window[-lookback:]
@@ -0,0 +1,124 @@
+"""Turn Binance kline responses into typed column arrays in one pass.
+
+`parse_klines` converts the usual nested list of strings column by column.
+`parse_kline_payload` starts from the raw response body. It strips the JSON
+punctuation in C, splits the body once, and slices each field with a stride,
+so the nested per-candle lists are never built. `fetch_klines` requests a
+body that way, so `get_klines` callers can get columns without a
+`response.json()` round trip.
+
+It serves the bulk readers: backfill.py, backtest.py and kline_store.py. The
+Lambda tick path does not use it. Once warm, KlineCache asks Binance for the
+one or two candles closed since the last tick, and IndicatorEngine takes them
+one at a time. There is no large body to parse, and numpy would only add to
+the package and to every cold start, so it stays in requirements-tools.txt.
+"""
+import numpy as np
+
+# name -> (position in a kline, dtype)
+KLINE_COLUMNS = {
+    'open_time': (0, np.int64),
+    'open': (1, np.float64),
+    'high': (2, np.float64),
+    'low': (3, np.float64),
+    'close': (4, np.float64),
+    'volume': (5, np.float64),
+    'close_time': (6, np.int64),
+    'quote_volume': (7, np.float64),
+    'trades': (8, np.int64),
+    'taker_buy_base_volume': (9, np.float64),
+    'taker_buy_quote_volume': (10, np.float64),
+}
+KLINE_WIDTH = 12
+
+DEFAULT_FIELDS = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'trades')
+
+
+def _empty(fields):
+    return {name: np.empty(0, dtype=KLINE_COLUMNS[name][1]) for name in fields}
+
+
+def parse_klines(klines, fields=DEFAULT_FIELDS):
+    """Columns from an already decoded kline list (as returned by get_klines)."""
+    if not klines:
+        return _empty(fields)
+    transposed = list(zip(*klines))
+    return {name: np.array(transposed[KLINE_COLUMNS[name][0]], dtype=KLINE_COLUMNS[name][1])
+            for name in fields}
+
+
+def parse_kline_payload(payload, fields=DEFAULT_FIELDS):
+    """Columns straight from a raw kline response body (bytes or str)."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    flat = payload.translate(None, b'[]" \t\r\n').split(b',')
+    if len(flat) < KLINE_WIDTH:
+        return _empty(fields)
+    if len(flat) % KLINE_WIDTH:
+        raise ValueError("kline payload does not have 12 fields per candle")
+    columns = {}
+    for name in fields:
+        index, dtype = KLINE_COLUMNS[name]
+        convert = int if dtype is np.int64 else float
+        values = flat[index::KLINE_WIDTH]
+        columns[name] = np.fromiter(map(convert, values), dtype=dtype, count=len(values))
+    return columns
+
+
+def fetch_klines(client, symbol, interval, fields=DEFAULT_FIELDS, **params):
+    """GET /api/v3/klines through the client's session and parse the body directly."""
+    from binance.exceptions import BinanceAPIException
+
+    params.update(symbol=symbol, interval=interval)
+    if 'endTime' in params and not params['endTime']:
+        del params['endTime']
+    uri = client._create_api_uri('klines', signed=False, version=client.PRIVATE_API_VERSION)
+    response = client.session.get(uri, params=params, timeout=10)
+    client.response = response  # keep used-weight headers visible like any other client call
+    if not 200 <= response.status_code < 300:
+        raise BinanceAPIException(response, response.status_code, response.text)
+    return parse_kline_payload(response.content, fields)
+
+
+if __name__ == "__main__":
+    import json
+    import random
+    import timeit
+    import tracemalloc
+
+    candles = 1000
+    start = 1700000000000
+    klines = [[start + i * 60000, f"{30000 + random.random():.8f}", f"{30010 + random.random():.8f}",
+               f"{29990 + random.random():.8f}", f"{30000 + random.random():.8f}", f"{random.random() * 50:.8f}",
+               start + i * 60000 + 59999, f"{random.random() * 1e6:.8f}", random.randint(100, 5000),
+               f"{random.random() * 25:.8f}", f"{random.random() * 5e5:.8f}", "0"]
+              for i in range(candles)]
+    payload = json.dumps(klines, separators=(',', ':')).encode()
+
+    def current():
+        # What callers do today: response.json() then one float() list per field
+        decoded = json.loads(payload)
+        return {name: [float(k[KLINE_COLUMNS[name][0]]) for k in decoded] for name in DEFAULT_FIELDS}
+
+    def from_lists():
+        return parse_klines(json.loads(payload))
+
+    def from_payload():
+        return parse_kline_payload(payload)
+
+    reference = current()
+    for variant in (from_lists, from_payload):
+        columns = variant()
+        for name in DEFAULT_FIELDS:
+            assert np.array_equal(columns[name], reference[name]), (variant.__name__, name)
+
+    print(f"{candles}-candle response ({len(payload)} bytes)")
+    for variant in (current, from_lists, from_payload):
+        seconds = min(timeit.repeat(variant, number=50, repeat=7)) / 50
+        tracemalloc.start()
+        result = variant()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        print(f"{variant.__name__:>13}: {seconds * 1e6:6.0f} us  peak {peak / 1024:5.0f} KiB"
+              f"  retained {retained / 1024:5.0f} KiB")
@@ -0,0 +1,163 @@
+"""On-disk columnar kline history, one directory per symbol/interval.
+
+Each column is a flat file of fixed-width values (`open_time.bin`,
+`close.bin`, ...) that is appended to in place and read back as a read-only
+numpy memmap. Reads are zero-copy and never parse JSON. The series length is
+taken from the shortest column, so a crash halfway through an append only
+loses the partial row.
+"""
+import os
+import shutil
+
+import numpy as np
+from binance.helpers import interval_to_milliseconds
+
+from kline_parser import parse_klines
+
+KLINE_STORE_DIR = os.environ.get('KLINE_STORE_DIR', 'klines')
+
+COLUMNS = {
+    'open_time': np.int64,
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.float64,
+    'trades': np.int64,
+}
+
+
+class KlineSeries:
+    """Append-only candles of one symbol/interval, sorted by open time."""
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.interval_ms = interval_to_milliseconds(interval)
+        os.makedirs(path, exist_ok=True)
+        self._length = self._recover()
+        self._maps = {}
+
+    def _file(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def _recover(self):
+        sizes = {}
+        for name, dtype in COLUMNS.items():
+            path = self._file(name)
+            sizes[name] = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+        length = min(sizes.values())
+        for name, size in sizes.items():
+            if size > length:  # drop the tail of an interrupted append
+                with open(self._file(name), 'r+b') as f:
+                    f.truncate(length * np.dtype(COLUMNS[name]).itemsize)
+        return length
+
+    def __len__(self):
+        return self._length
+
+    def column(self, name):
+        """Read-only memmap of a whole column."""
+        if not self._length:
+            return np.empty(0, dtype=COLUMNS[name])
+        mapped = self._maps.get(name)
+        if mapped is None or len(mapped) != self._length:
+            mapped = np.memmap(self._file(name), dtype=COLUMNS[name], mode='r', shape=(self._length,))
+            self._maps[name] = mapped
+        return mapped
+
+    @property
+    def last_open_time(self):
+        return int(self.column('open_time')[-1]) if self._length else None
+
+    def append(self, columns):
+        """Append candles given as a dict of column arrays or as raw klines.
+
+        Candles that are not newer than the last stored one are skipped, so
+        overlapping fetches can be appended as they are. Returns the number of
+        candles written.
+        """
+        if not isinstance(columns, dict):
+            columns = parse_klines(columns, tuple(COLUMNS))
+        open_times = np.asarray(columns['open_time'], dtype=np.int64)
+        if self._length:
+            keep = open_times > self.last_open_time
+            if not keep.all():
+                columns = {name: np.asarray(values)[keep] for name, values in columns.items()}
+                open_times = open_times[keep]
+        if not len(open_times):
+            return 0
+        if np.any(np.diff(open_times) <= 0):
+            raise ValueError("candles must be sorted by open time without duplicates")
+
+        for name, dtype in COLUMNS.items():
+            with open(self._file(name), 'ab') as f:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        self._length += len(open_times)
+        return len(open_times)
+
+    def _position(self, open_time):
+        """Number of stored candles opening before `open_time`."""
+        n = self._length
+        if not n:
+            return 0
+        open_times = self.column('open_time')
+        first, last = int(open_times[0]), int(open_times[-1])
+        if last - first == (n - 1) * self.interval_ms:
+            # No gaps: the position follows directly from the open time
+            offset = -((first - open_time) // self.interval_ms)  # ceil division
+            return min(max(offset, 0), n)
+        return int(np.searchsorted(open_times, open_time, side='left'))
+
+    def slice(self, start_time=None, end_time=None):
+        """Zero-copy column views of the candles with start_time <= open_time < end_time."""
+        start = 0 if start_time is None else self._position(start_time)
+        end = self._length if end_time is None else self._position(end_time)
+        return {name: self.column(name)[start:max(start, end)] for name in COLUMNS}
+
+
+class KlineStore:
+    """Directory of KlineSeries laid out as <root>/<symbol>/<interval>/."""
+
+    def __init__(self, root=KLINE_STORE_DIR):
+        self.root = root
+        self._series = {}
+
+    def series(self, symbol, interval):
+        key = (symbol, interval)
+        if key not in self._series:
+            path = os.path.join(self.root, symbol, interval)
+            self._recover_swap(path)
+            self._series[key] = KlineSeries(path, interval)
+        return self._series[key]
+
+    @staticmethod
+    def _recover_swap(path):
+        """Finish a `replace` that died between its two renames."""
+        if os.path.exists(path):
+            return
+        # The staging copy was complete before the old series was moved aside
+        for candidate in (path + '.new', path + '.old'):
+            if os.path.isdir(candidate):
+                os.rename(candidate, path)
+                return
+
+    def replace(self, symbol, interval, columns):
+        """Swap a series for the given sorted columns, e.g. after filling gaps in its middle."""
+        path = os.path.join(self.root, symbol, interval)
+        staging = path + '.new'
+        shutil.rmtree(staging, ignore_errors=True)
+        KlineSeries(staging, interval).append(columns)
+        retired = path + '.old'
+        shutil.rmtree(retired, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, retired)
+        os.rename(staging, path)
+        shutil.rmtree(retired, ignore_errors=True)
+        self._series.pop((symbol, interval), None)
+        return self.series(symbol, interval)
+
+    def symbols(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
@@ -0,0 +1,137 @@
+"""Per-stage latency of the tick-to-decision path.
+
+Code under `recorder.tick(symbol)` times its stages with `recorder.stage(name)`
+and notes how old its market data was with `recorder.data_age(close_time_ms)`.
+Every tick is emitted as one JSON record. Durations also go into log-bucketed
+histograms that live as long as the process (or warm Lambda container), and
+`flush()` writes them to LATENCY_METRICS_PATH.
+"""
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_METRICS_PATH = os.environ.get('LATENCY_METRICS_PATH')
+
+BUCKET_FLOOR_MS = 0.01
+BUCKETS_PER_DOUBLING = 4  # buckets are ~19% wide
+
+
+class Histogram:
+    """Counts of millisecond values in logarithmic buckets."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        index = int(math.log2(max(value, BUCKET_FLOOR_MS) / BUCKET_FLOOR_MS) * BUCKETS_PER_DOUBLING)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @staticmethod
+    def upper_bound(index):
+        return BUCKET_FLOOR_MS * 2 ** ((index + 1) / BUCKETS_PER_DOUBLING)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, capped at the maximum seen."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        def ms(value):
+            return None if value is None else round(value, 3)
+
+        return {
+            'count': self.count,
+            'mean': ms(self.total / self.count) if self.count else None,
+            'min': ms(self.min),
+            'p50': ms(self.percentile(50)),
+            'p90': ms(self.percentile(90)),
+            'p99': ms(self.percentile(99)),
+            'max': ms(self.max),
+            'buckets': {round(self.upper_bound(i), 3): n for i, n in sorted(self.buckets.items())},
+        }
+
+
+class LatencyRecorder:
+    """Stage timers and data-age tracking, safe to share between worker threads."""
+
+    def __init__(self, path=LATENCY_METRICS_PATH, emit=print):
+        self.path = path
+        self.emit = emit
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _record(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(value)
+
+    @contextmanager
+    def tick(self, symbol):
+        """Collect the stages of one decision and emit them as a single record."""
+        record = {'metric': 'tick_latency', 'symbol': symbol, 'stages': {}}
+        self._local.current = record
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self._local.current = None
+            record['total_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            self._record('total', record['total_ms'])
+            if self.emit:
+                self.emit(json.dumps(record))
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = round((time.perf_counter() - started) * 1000, 3)
+            self._record(name, elapsed)
+            current = getattr(self._local, 'current', None)
+            if current is not None:
+                current['stages'][name] = elapsed
+
+    def data_age(self, close_time_ms):
+        """Record how long ago, in ms, the newest data behind the decision was produced."""
+        if close_time_ms is None:
+            return
+        age = max(time.time() * 1000 - close_time_ms, 0)
+        self._record('data_age', age)
+        current = getattr(self._local, 'current', None)
+        if current is not None:
+            current['data_age_ms'] = round(age, 1)
+
+    def summary(self):
+        with self._lock:
+            return {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+
+    def flush(self):
+        """Write the histograms to the metrics file, if one is configured."""
+        if not self.path:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'updated': int(time.time() * 1000), 'histograms': self.summary()}, f)
+        os.replace(tmp_path, self.path)
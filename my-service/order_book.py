@@ -0,0 +1,212 @@
+"""Local order book kept in sync from a depth snapshot plus diff-depth events.
+
+Each side keeps its price levels in a sorted list with a dict of quantities,
+so the best bid and ask are O(1) reads and updates cost a binary search.
+Depth events are checked for sequence gaps with Binance's U/u update ids, and
+a gap forces a fresh snapshot.
+
+DepthBookFeed maintains a live book from the websocket. ReplayDepthFeed
+replays a recorded NDJSON file (snapshots and depthUpdate events) so the
+same code can be exercised offline.
+"""
+import json
+import queue
+import threading
+from bisect import bisect_left
+
+
+class SequenceGap(Exception):
+    """A depth event does not follow on from the last applied update id."""
+
+
+class BookSide:
+    """Price levels of one side, sorted ascending."""
+
+    def __init__(self):
+        self.prices = []
+        self.quantities = {}
+
+    def clear(self):
+        self.prices = []
+        self.quantities = {}
+
+    def set(self, price, quantity):
+        if quantity == 0:
+            if price in self.quantities:
+                del self.quantities[price]
+                del self.prices[bisect_left(self.prices, price)]
+            return
+        if price not in self.quantities:
+            index = bisect_left(self.prices, price)
+            self.prices.insert(index, price)
+        self.quantities[price] = quantity
+
+    def __len__(self):
+        return len(self.prices)
+
+
+class OrderBook:
+    def __init__(self, symbol=None):
+        self.symbol = symbol
+        self.bids = BookSide()
+        self.asks = BookSide()
+        self.last_update_id = None
+        self.event_time = None
+
+    @property
+    def synced(self):
+        return self.last_update_id is not None
+
+    def load_snapshot(self, snapshot):
+        """Reset the book from a REST depth snapshot (`get_order_book`)."""
+        self.bids.clear()
+        self.asks.clear()
+        for price, quantity in snapshot['bids']:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in snapshot['asks']:
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = snapshot['lastUpdateId']
+
+    def apply(self, event):
+        """Apply a depthUpdate event. Returns False for events the snapshot already covers."""
+        if not self.synced:
+            raise SequenceGap("no snapshot loaded")
+        first, last = event['U'], event['u']
+        if last <= self.last_update_id:
+            return False
+        if first > self.last_update_id + 1:
+            expected = self.last_update_id + 1
+            self.last_update_id = None
+            raise SequenceGap(f"expected update {expected}, got {first}..{last}")
+        for price, quantity in event['b']:
+            self.bids.set(float(price), float(quantity))
+        for price, quantity in event['a']:
+            self.asks.set(float(price), float(quantity))
+        self.last_update_id = last
+        self.event_time = event.get('E')
+        return True
+
+    @property
+    def best_bid(self):
+        if not self.bids.prices:
+            return None
+        price = self.bids.prices[-1]
+        return price, self.bids.quantities[price]
+
+    @property
+    def best_ask(self):
+        if not self.asks.prices:
+            return None
+        price = self.asks.prices[0]
+        return price, self.asks.quantities[price]
+
+    @property
+    def spread(self):
+        bid, ask = self.best_bid, self.best_ask
+        return ask[0] - bid[0] if bid and ask else None
+
+    @property
+    def mid(self):
+        bid, ask = self.best_bid, self.best_ask
+        return (ask[0] + bid[0]) / 2 if bid and ask else None
+
+    @property
+    def microprice(self):
+        """Mid price weighted towards the side with less resting quantity."""
+        bid, ask = self.best_bid, self.best_ask
+        if not bid or not ask:
+            return None
+        (bid_price, bid_qty), (ask_price, ask_qty) = bid, ask
+        return (bid_price * ask_qty + ask_price * bid_qty) / (bid_qty + ask_qty)
+
+    def imbalance(self, levels=1):
+        """(bid - ask) / (bid + ask) quantity over the top `levels` levels, in [-1, 1]."""
+        bid_qty = sum(self.bids.quantities[p] for p in self.bids.prices[-levels:])
+        ask_qty = sum(self.asks.quantities[p] for p in self.asks.prices[:levels])
+        total = bid_qty + ask_qty
+        return (bid_qty - ask_qty) / total if total else None
+
+
+class DepthBookFeed:
+    """Live order book from the diff-depth websocket, resynced from REST on gaps.
+
+    `callback(book)` is called after every applied update. With `record_path`
+    set, snapshots and events are appended to an NDJSON file that
+    ReplayDepthFeed can play back.
+    """
+
+    def __init__(self, client, symbol, snapshot_limit=1000, update_speed=100, record_path=None):
+        self.client = client
+        self.symbol = symbol
+        self.snapshot_limit = snapshot_limit
+        self.update_speed = update_speed
+        self.record_path = record_path
+        self.book = OrderBook(symbol)
+        self._events = queue.Queue()
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _snapshot(self, record):
+        snapshot = self.client.get_order_book(symbol=self.symbol, limit=self.snapshot_limit)
+        if record:
+            record.write(json.dumps(snapshot) + '\n')
+        self.book.load_snapshot(snapshot)
+
+    def run(self, callback):
+        from binance import ThreadedWebsocketManager
+
+        record = open(self.record_path, 'a') if self.record_path else None
+        twm = ThreadedWebsocketManager()
+        twm.start()
+        try:
+            twm.start_depth_socket(callback=self._events.put, symbol=self.symbol, interval=self.update_speed)
+            while not self._stopped.is_set():
+                try:
+                    event = self._events.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if event.get('e') != 'depthUpdate':
+                    continue
+                if record:
+                    record.write(json.dumps(event) + '\n')
+                if not self.book.synced:
+                    # Events keep buffering in the queue while the snapshot is fetched
+                    self._snapshot(record)
+                try:
+                    if self.book.apply(event):
+                        callback(self.book)
+                except SequenceGap:
+                    self._snapshot(record)
+        finally:
+            twm.stop()
+            if record:
+                record.close()
+
+
+class ReplayDepthFeed:
+    """Offline stand-in for DepthBookFeed reading a recorded NDJSON file."""
+
+    def __init__(self, path, symbol=None):
+        self.path = path
+        self.book = OrderBook(symbol)
+        self.gaps = 0
+
+    def run(self, callback):
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                message = json.loads(line)
+                if 'lastUpdateId' in message:
+                    self.book.load_snapshot(message)
+                    continue
+                if message.get('e') != 'depthUpdate' or not self.book.synced:
+                    continue
+                try:
+                    if self.book.apply(message):
+                        callback(self.book)
+                except SequenceGap:
+                    self.gaps += 1  # wait for the next recorded snapshot
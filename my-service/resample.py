@@ -0,0 +1,140 @@
+"""Build higher-timeframe candles locally from 1m candles or trades.
+
+Buckets are aligned the way Binance aligns them: minute, hour and day
+candles start on multiples of the interval since the epoch, and weekly
+candles start on Monday 00:00 UTC. Output candles use the raw 12-field kline
+shape, so IndicatorEngine.update_kline, KlineSeries.append and anything else
+that reads get_klines output can consume them unchanged.
+"""
+from binance.helpers import interval_to_milliseconds
+
+WEEK_OFFSET_MS = 4 * 24 * 60 * 60 * 1000  # 1970-01-01 was a Thursday
+
+
+def interval_ms(interval):
+    ms = interval_to_milliseconds(interval)
+    if ms is None:
+        raise ValueError(f"unsupported interval {interval!r}")
+    return ms
+
+
+class Resampler:
+    """Incremental candle aggregation into one higher interval.
+
+    `add_kline` and `add_trade` return the candles they completed (usually
+    none, sometimes one). A candle is complete once its last base candle has
+    arrived, or once data for a later bucket shows up. `current` is the candle
+    still being built, like the last entry of a get_klines response.
+    """
+
+    def __init__(self, interval, base_interval='1m'):
+        self.interval = interval
+        self.interval_ms = interval_ms(interval)
+        self.base_ms = interval_ms(base_interval)
+        if self.interval_ms % self.base_ms:
+            raise ValueError(f"{interval} is not a multiple of {base_interval}")
+        self.offset = WEEK_OFFSET_MS if interval.endswith('w') else 0
+        self.current = None
+        self.last_time = None
+
+    def bucket(self, timestamp):
+        return (timestamp - self.offset) // self.interval_ms * self.interval_ms + self.offset
+
+    def _start(self, open_time):
+        # open, high, low, close, volume, quote volume, trades, taker base, taker quote
+        self._values = [None, float('-inf'), float('inf'), None, 0.0, 0.0, 0, 0.0, 0.0]
+        self._open_time = open_time
+
+    def _kline(self):
+        o, h, l, c, volume, quote, trades, taker_base, taker_quote = self._values
+        return [self._open_time, str(o), str(h), str(l), str(c), str(volume),
+                self._open_time + self.interval_ms - 1, str(quote), trades,
+                str(taker_base), str(taker_quote), "0"]
+
+    def _roll(self, timestamp):
+        """Close the current candle if `timestamp` belongs to a later bucket."""
+        completed = []
+        bucket = self.bucket(timestamp)
+        if self.current is not None and bucket != self._open_time:
+            completed.append(self.current)
+            self.current = None
+        if self.current is None:
+            self._start(bucket)
+        return completed
+
+    def add_kline(self, kline):
+        """Fold in one closed base-interval kline. Candles already seen are ignored."""
+        open_time = kline[0]
+        if self.last_time is not None and open_time <= self.last_time:
+            return []
+        self.last_time = open_time
+        completed = self._roll(open_time)
+
+        values = self._values
+        if values[0] is None:
+            values[0] = float(kline[1])
+        values[1] = max(values[1], float(kline[2]))
+        values[2] = min(values[2], float(kline[3]))
+        values[3] = float(kline[4])
+        values[4] += float(kline[5])
+        values[5] += float(kline[7])
+        values[6] += int(kline[8])
+        values[7] += float(kline[9])
+        values[8] += float(kline[10])
+        self.current = self._kline()
+
+        if kline[6] >= self._open_time + self.interval_ms - 1:
+            completed.append(self.current)
+            self.current = None
+        return completed
+
+    def add_trade(self, trade_time, price, quantity, buyer_maker=False):
+        """Fold in one trade (a websocket trade event's T, p, q and m fields)."""
+        if self.last_time is not None and trade_time < self.last_time:
+            return []
+        self.last_time = trade_time
+        completed = self._roll(trade_time)
+
+        price, quantity = float(price), float(quantity)
+        values = self._values
+        if values[0] is None:
+            values[0] = price
+        values[1] = max(values[1], price)
+        values[2] = min(values[2], price)
+        values[3] = price
+        values[4] += quantity
+        values[5] += price * quantity
+        values[6] += 1
+        if not buyer_maker:  # the taker bought
+            values[7] += quantity
+            values[8] += price * quantity
+        self.current = self._kline()
+        return completed
+
+    def close_due(self, now):
+        """Complete the current candle once its close time has passed, for trade-fed resampling."""
+        if self.current is not None and now > self.current[6]:
+            completed, self.current = [self.current], None
+            return completed
+        return []
+
+
+def resample_klines(klines, interval, base_interval='1m', include_current=False):
+    """Higher-interval candles from a run of closed base candles.
+
+    A leading bucket the input does not cover from its start is dropped, so
+    every candle returned aggregates exactly the base candles it should. With
+    `include_current`, the unfinished last bucket is appended as the candle
+    in progress.
+    """
+    if not klines:
+        return []
+    resampler = Resampler(interval, base_interval)
+    candles = []
+    for k in klines:
+        candles.extend(resampler.add_kline(k))
+    if include_current and resampler.current is not None:
+        candles.append(resampler.current)
+    if klines[0][0] != resampler.bucket(klines[0][0]):
+        candles = candles[1:]
+    return candles
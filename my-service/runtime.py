@@ -0,0 +1,235 @@
+"""Run many strategy instances off one shared market-data feed.
+
+Each tick, MarketFeed fetches klines and prices once per symbol, whatever the
+number of strategies, and every Strategy gets a MarketSnapshot for its
+symbol. Strategies keep their own position state, so several variants of the
+same rules can run side by side on one symbol.
+
+    python runtime.py --strategy rsi_ma:BTCUSDT --strategy ma:BTCUSDT:window=50 \\
+        --strategy ma:ETHUSDT:stop_loss=0.01 --strategy rsi_ma:BTCUSDT:timeframe=15m
+"""
+import logging
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from indicators import IndicatorEngine, Rsi, Sma
+from resample import Resampler
+from strategy import StrategyParams, decide_trade
+
+MarketSnapshot = namedtuple('MarketSnapshot', ['symbol', 'price', 'klines', 'time'])
+
+# Most 1m candles a strategy may ask for (one KlineCache buffer); higher timeframes warm up past it
+MAX_LOOKBACK = 1000
+
+# Above this many symbols a single all-symbol ticker call is cheaper than one per symbol
+ALL_TICKERS_FROM = 3
+
+
+class MarketFeed:
+    """Fetches each symbol's candles and last price once per tick."""
+
+    def __init__(self, client, interval='1m', kline_cache=None):
+        from kline_cache import KlineCache
+
+        self.client = client
+        self.interval = interval
+        self.kline_cache = kline_cache or KlineCache(client)
+
+    def _prices(self, symbols):
+        if len(symbols) >= ALL_TICKERS_FROM:
+            wanted = set(symbols)
+            return {t['symbol']: t['price'] for t in self.client.get_symbol_ticker() if t['symbol'] in wanted}
+        return {s: self.client.get_symbol_ticker(symbol=s)['price'] for s in symbols}
+
+    def snapshots(self, lookbacks):
+        """MarketSnapshot per symbol, given {symbol: candles needed}."""
+        prices = self._prices(sorted(lookbacks))
+        now = int(time.time() * 1000)
+        return {symbol: MarketSnapshot(symbol, prices[symbol],
+                                       self.kline_cache.get_klines(symbol, self.interval, lookback), now)
+                for symbol, lookback in lookbacks.items()}
+
+
+class Strategy:
+    """Base class for strategies driven by StrategyRuntime.
+
+    Subclasses set `lookback` (candles they need, including the one in
+    progress) and implement `on_tick`, returning "BUY", "SELL" or "HOLD".
+    """
+    name = 'strategy'
+    lookback = 1
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def on_tick(self, snapshot):
+        raise NotImplementedError
+
+    def to_dict(self):
+        return {'name': self.name, 'symbol': self.symbol}
+
+
+class MovingAverageStrategy(Strategy):
+    """The genesis.py rules: price against an N-candle MA, with stop-loss and take-profit."""
+    name = 'ma'
+
+    def __init__(self, symbol, window=20, stop_loss=0.02, take_profit=0.05):
+        super().__init__(symbol)
+        self.window = int(window)
+        self.stop_loss_pct = stop_loss
+        self.take_profit_pct = take_profit
+        self.lookback = self.window
+        self.position_price = None
+        self.profit = 0.0
+
+    def on_tick(self, snapshot):
+        closes = [float(k[4]) for k in snapshot.klines[-self.window:]]
+        if not closes:
+            return "HOLD"
+        ma = sum(closes) / len(closes)
+        price = float(snapshot.price)
+
+        if self.position_price is not None:
+            hit_limit = (price <= self.position_price * (1 - self.stop_loss_pct)
+                         or price >= self.position_price * (1 + self.take_profit_pct))
+            if hit_limit or price < ma:
+                self.position_price = None
+                self.profit += price
+                return "SELL"
+        elif price > ma:
+            self.position_price = price
+            self.profit -= price
+            return "BUY"
+        return "HOLD"
+
+    def to_dict(self):
+        return dict(super().to_dict(), window=self.window, position_price=self.position_price,
+                    profit=self.profit)
+
+
+class RsiMaStrategy(Strategy):
+    """The Lambda's RSI + MA-crossover rules (strategy.decide_trade) on incremental indicators.
+
+    With `timeframe` (e.g. '15m') the indicators run on candles resampled
+    locally from the shared 1m feed, so no extra klines are requested.
+    """
+    name = 'rsi_ma'
+
+    def __init__(self, symbol, rsi_period=14, rsi_overbought=80, rsi_oversold=20, stop_loss=0.0015,
+                 take_profit=0.001, short_window=5, long_window=20, timeframe=None):
+        super().__init__(symbol)
+        self.params = StrategyParams(int(rsi_period), rsi_overbought, rsi_oversold, stop_loss,
+                                     take_profit, int(short_window), int(long_window))
+        candles = max(self.params.rsi_period + 1, self.params.long_window) + 10
+        self.resampler = Resampler(timeframe) if timeframe and timeframe != '1m' else None
+        if self.resampler:
+            candles = min((candles + 1) * self.resampler.interval_ms // self.resampler.base_ms, MAX_LOOKBACK)
+        self.lookback = candles
+        self.indicators = IndicatorEngine({
+            "rsi": Rsi(self.params.rsi_period),
+            "short_ma": Sma(self.params.short_window),
+            "long_ma": Sma(self.params.long_window),
+        })
+        self.position = "NEUTRAL"
+        self.previous_price = None  # the Lambda compares against the price stored on the last tick
+        self.accumulated_gain = Decimal('0')
+
+    def on_tick(self, snapshot):
+        for k in snapshot.klines:
+            if k[6] >= snapshot.time:
+                continue
+            if self.resampler:
+                if self.resampler.last_time is None and k[0] != self.resampler.bucket(k[0]):
+                    continue  # start on a bucket boundary so the first candle is complete
+                for candle in self.resampler.add_kline(k):
+                    self.indicators.update_kline(candle)
+            else:
+                self.indicators.update_kline(k)
+        price = Decimal(snapshot.price)
+        if not self.indicators.ready:
+            self.previous_price = price
+            return "HOLD"
+
+        action, self.position, _, self.accumulated_gain = decide_trade(
+            self.params, self.position, self.previous_price, self.accumulated_gain, price,
+            self.indicators["rsi"], self.indicators["short_ma"], self.indicators["long_ma"])
+        self.previous_price = price
+        return action
+
+    def to_dict(self):
+        return dict(super().to_dict(), position=self.position,
+                    accumulated_gain=str(self.accumulated_gain))
+
+
+STRATEGY_TYPES = {cls.name: cls for cls in (MovingAverageStrategy, RsiMaStrategy)}
+
+
+def build_strategy(spec):
+    """Strategy from a `name:SYMBOL[:key=value,...]` spec, e.g. `rsi_ma:BTCUSDT:timeframe=15m`."""
+    name, symbol, *options = spec.split(':')
+    kwargs = {}
+    for option in filter(None, ','.join(options).split(',')):
+        key, value = option.split('=', 1)
+        try:
+            kwargs[key] = float(value)
+        except ValueError:
+            kwargs[key] = value
+    return STRATEGY_TYPES[name](symbol, **kwargs)
+
+
+class StrategyRuntime:
+    def __init__(self, feed, strategies):
+        self.feed = feed
+        self.strategies = list(strategies)
+
+    def add(self, strategy):
+        self.strategies.append(strategy)
+
+    def tick(self):
+        """Fetch market data once and run every strategy on it. Returns (strategy, action) pairs."""
+        lookbacks = {}
+        for strategy in self.strategies:
+            lookbacks[strategy.symbol] = max(lookbacks.get(strategy.symbol, 0), strategy.lookback)
+        snapshots = self.feed.snapshots(lookbacks)
+
+        results = []
+        for strategy in self.strategies:
+            try:
+                action = strategy.on_tick(snapshots[strategy.symbol])
+            except Exception as e:
+                logging.error("%s %s failed: %r", strategy.name, strategy.symbol, e)
+                action = None
+            results.append((strategy, action))
+        return results
+
+    def run(self, period=60):
+        while True:
+            started = time.time()
+            try:
+                for strategy, action in self.tick():
+                    if action and action != "HOLD":
+                        logging.info("%s %s %s %s", strategy.name, strategy.symbol, action, strategy.to_dict())
+            except Exception as e:
+                logging.error("Tick failed: %r", e)
+            time.sleep(max(0, period - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from binance.client import Client
+    from api_scheduler import RateLimitedClient
+
+    parser = argparse.ArgumentParser(description="Run several strategies on one shared market feed")
+    parser.add_argument("--strategy", action="append", required=True,
+                        help="name:SYMBOL[:key=value,...], name one of " + ", ".join(STRATEGY_TYPES))
+    parser.add_argument("--interval", default="1m")
+    parser.add_argument("--period", type=float, default=60, help="seconds between ticks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    client = RateLimitedClient(Client(os.environ.get('BINANCE_API_KEY'), os.environ.get('BINANCE_API_SECRET')))
+    StrategyRuntime(MarketFeed(client, args.interval), map(build_strategy, args.strategy)).run(args.period)
@@ -0,0 +1,180 @@
+"""Buffered DynamoDB writes for the state items of one tick.
+
+Items are collected with `add` and written by `flush`, 25 per BatchWriteItem
+call, with the calls running in parallel. Unprocessed items are retried with
+exponential backoff and full jitter. `flush` reports the outcome of every
+item, so callers know exactly which states were persisted.
+
+With `latest_table_name` set, each item is also written to that table,
+keyed by symbol alone. That table always holds the newest state of every
+symbol, and `batch_get_items` reads it back 100 symbols per call. `add` can
+limit an item to some of the tables, e.g. to refresh only the latest state.
+
+`add` can also make the latest-state write conditional on the version it
+replaces. BatchWriteItem takes no conditions, so these go out first as
+parallel PutItem calls. An item whose condition fails is reported as
+CONDITION_FAILED, and its other table writes are dropped.
+
+Both take the client of a DynamoDB resource (`resource.meta.client`). Unlike
+the resource it is thread-safe, and it still takes and returns plain Python
+values.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_SIZE = 25  # BatchWriteItem limit
+GET_BATCH_SIZE = 100  # BatchGetItem limit
+MAX_ATTEMPTS = 8
+BASE_DELAY = 0.05
+MAX_DELAY = 2.0
+CONDITION_FAILED = 'ConditionalCheckFailedException'
+
+
+def _backoff(attempt):
+    time.sleep(random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt)))
+
+
+class StateWriter:
+    def __init__(self, dynamodb, table_name='TradingState', key=('symbol', 'timestamp'), max_workers=8,
+                 latest_table_name=None, latest_key=('symbol',)):
+        self.dynamodb = dynamodb
+        self.keys = {table_name: key}
+        self.table_name = table_name
+        self.latest_table_name = latest_table_name
+        if latest_table_name:
+            self.keys[latest_table_name] = latest_key
+        self.max_workers = max_workers
+        self._items = {}
+        self._conditional = {}
+        self._added = []
+        self._lock = threading.Lock()
+
+    def _key(self, table_name, item):
+        return (table_name,) + tuple(item[name] for name in self.keys[table_name])
+
+    def add(self, item, tables=None, conditions=None):
+        """Queue `item` for `tables` (names), by default the history table and the latest table.
+
+        `conditions` maps table names to (ConditionExpression, ExpressionAttributeNames,
+        ExpressionAttributeValues) for writes that must not overwrite a newer item.
+        """
+        tables = list(self.keys) if tables is None else tables
+        conditions = conditions or {}
+        with self._lock:
+            # A batch may not hold the same key twice; the later item wins
+            for table_name in tables:
+                key = self._key(table_name, item)
+                if table_name in conditions:
+                    self._conditional[key] = (table_name, item, conditions[table_name])
+                else:
+                    self._items[key] = (table_name, item)
+            self._added.append((item, tables))
+
+    def __len__(self):
+        return len(self._items) + len(self._conditional)
+
+    def _put_conditional(self, write):
+        table_name, item, (expression, names, values) = write
+        kwargs = {'ExpressionAttributeValues': values} if values else {}
+        try:
+            self.dynamodb.put_item(TableName=table_name, Item=item, ConditionExpression=expression,
+                                   ExpressionAttributeNames=names, **kwargs)
+        except Exception as e:  # botocore's ClientError, not imported to keep cold starts cheap
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') == CONDITION_FAILED:
+                return CONDITION_FAILED
+            return repr(e)
+        return None
+
+    def _write_batch(self, writes):
+        """Write up to 25 (table, item) pairs, retrying what DynamoDB leaves unprocessed.
+
+        Returns {key: error or None}.
+        """
+        requests = {}
+        for table_name, item in writes:
+            requests.setdefault(table_name, []).append({'PutRequest': {'Item': item}})
+        outcomes = {}
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                response = self.dynamodb.batch_write_item(RequestItems=requests)
+            except Exception as e:  # the SDK already retried throttling and 5xx errors
+                for table_name, table_requests in requests.items():
+                    for request in table_requests:
+                        outcomes[self._key(table_name, request['PutRequest']['Item'])] = repr(e)
+                return outcomes
+            unprocessed = response.get('UnprocessedItems') or {}
+            for table_name, table_requests in requests.items():
+                pending = {self._key(table_name, r['PutRequest']['Item']) for r in unprocessed.get(table_name, [])}
+                for request in table_requests:
+                    key = self._key(table_name, request['PutRequest']['Item'])
+                    if key not in pending:
+                        outcomes[key] = None
+            requests = unprocessed
+            if not requests:
+                return outcomes
+            _backoff(attempt)
+        for table_name, table_requests in requests.items():
+            for request in table_requests:
+                outcomes[self._key(table_name, request['PutRequest']['Item'])] = \
+                    "unprocessed after %d attempts" % MAX_ATTEMPTS
+        return outcomes
+
+    def flush(self):
+        """Write everything buffered. Returns (item, error) pairs, error being None on success.
+
+        An item only counts as written when all of its table writes succeeded.
+        """
+        with self._lock:
+            items, self._items = self._items, {}
+            conditional, self._conditional = list(self._conditional.items()), {}
+            added, self._added = self._added, []
+        outcomes = dict(zip((key for key, _ in conditional),
+                            self._map(self._put_conditional, [write for _, write in conditional])))
+
+        # An item that lost its conditional write is stale: keep it out of every table
+        rejected = {id(item): outcomes[key] for key, (_, item, _) in conditional if outcomes[key] is not None}
+        writes = []
+        for key, write in items.items():
+            if id(write[1]) in rejected:
+                outcomes[key] = rejected[id(write[1])]
+            else:
+                writes.append((key, write))
+        batches = [[write for _, write in writes[i:i + BATCH_SIZE]] for i in range(0, len(writes), BATCH_SIZE)]
+        for result in self._map(self._write_batch, batches):
+            outcomes.update(result)
+
+        written = dict(items)
+        written.update((key, (table_name, item)) for key, (table_name, item, _) in conditional)
+        results = []
+        for item, tables in added:
+            error = None
+            for table_name in tables:
+                key = self._key(table_name, item)
+                if written[key][1] is item and outcomes[key] is not None:  # skip superseded items
+                    error = outcomes[key]
+                    break
+            results.append((item, error))
+        return results
+
+    def _map(self, function, jobs):
+        if len(jobs) <= 1:
+            return [function(job) for job in jobs]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as pool:
+            return list(pool.map(function, jobs))
+
+
+def batch_get_items(dynamodb, table_name, keys):
+    """Items for `keys` (a list of key dicts), fetched 100 per BatchGetItem call. Missing keys are skipped."""
+    items = []
+    for i in range(0, len(keys), GET_BATCH_SIZE):
+        request = {table_name: {'Keys': keys[i:i + GET_BATCH_SIZE]}}
+        for attempt in range(MAX_ATTEMPTS):
+            response = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(response['Responses'].get(table_name, []))
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+            _backoff(attempt)
+    return items
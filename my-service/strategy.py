@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+# Tunables of the RSI + MA-crossover strategy run by execute_trade
+StrategyParams = namedtuple('StrategyParams', [
+    'rsi_period', 'rsi_overbought', 'rsi_oversold',
+    'stop_loss', 'take_profit', 'short_window', 'long_window',
+])
+
+
+def decide_trade(params, position, last_trade_price, accumulated_gain, current_price, rsi, short_ma, long_ma):
+    """Apply the trading rules for one tick.
+
+    Works on Decimal (live trading) or float (backtests) prices alike.
+    Returns (action, position, last_trade_price, accumulated_gain).
+    """
+    trade_action = "HOLD"
+    percentage_change = (current_price - last_trade_price) / last_trade_price if last_trade_price else 0
+
+    # RSI based decision augmentation
+    if position == "LONG":
+        if rsi > params.rsi_overbought or percentage_change <= -params.stop_loss or percentage_change >= params.take_profit:
+            trade_action = "SELL"
+            position = "NEUTRAL"
+            if last_trade_price:  # If a purchase price exists
+                occurred_gain = current_price - last_trade_price
+                accumulated_gain += occurred_gain
+
+    elif position == "NEUTRAL" and rsi < params.rsi_oversold:
+        trade_action = "BUY"
+        position = "LONG"
+        accumulated_gain -= current_price
+
+    if trade_action == "HOLD":
+        if short_ma > long_ma and position != "LONG":
+            trade_action = "BUY"
+            position = "LONG"
+            last_trade_price = current_price  # Store the purchase price for future calculations
+        elif short_ma < long_ma and position != "NEUTRAL":
+            trade_action = "SELL"
+            position = "NEUTRAL"
+            if last_trade_price:  # If a purchase price exists
+                occurred_gain = current_price - last_trade_price
+                accumulated_gain += occurred_gain
+
+    return trade_action, position, last_trade_price, accumulated_gain
@@ -0,0 +1,137 @@
+"""Grid or random search over the strategy parameters on all CPU cores.
+
+Close prices are placed in shared memory once. Each worker maps them without
+copying and keeps a per-process cache of indicator series keyed by period.
+Combinations are generated lazily and submitted in bounded batches, and each
+result is written to the output CSV as it arrives. A 100k-combination sweep
+therefore never holds more than one batch in memory.
+"""
+import itertools
+import os
+import random
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+import batch_indicators
+from backtest import DEFAULT_PARAMS, simulate
+from strategy import StrategyParams
+
+BATCH_SIZE = 10000
+
+_closes = None
+_shm = None
+_indicator_cache = {}
+
+
+def _attach(shm_name, length):
+    global _closes, _shm
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    _closes = np.ndarray((length,), dtype=np.float64, buffer=_shm.buf)
+
+
+def _cached(indicator, period):
+    key = (indicator.__name__, period)
+    series = _indicator_cache.get(key)
+    if series is None:
+        series = _indicator_cache[key] = indicator(_closes, period)
+    return series
+
+
+def evaluate(params):
+    """Backtest one combination in a worker and return a compact result row."""
+    result = simulate(np.arange(len(_closes)), _closes, params,
+                      rsi=_cached(batch_indicators.rsi, params.rsi_period),
+                      short_ma=_cached(batch_indicators.sma, params.short_window),
+                      long_ma=_cached(batch_indicators.sma, params.long_window))
+    curve = result.accumulated_gain
+    drawdown = float(np.max(np.maximum.accumulate(curve) - curve)) if len(curve) else 0.0
+    return tuple(params) + (len(result.trades), float(curve[-1]) if len(curve) else 0.0, drawdown)
+
+
+def grid(space):
+    """Every combination of the candidate values in `space` (a dict of field -> list)."""
+    fields = StrategyParams._fields
+    for values in itertools.product(*(space[name] for name in fields)):
+        params = StrategyParams(*values)
+        if params.short_window < params.long_window:
+            yield params
+
+
+def random_search(space, count, seed=0):
+    """`count` combinations drawn uniformly from the candidate values in `space`."""
+    rng = random.Random(seed)
+    fields = StrategyParams._fields
+    produced = 0
+    while produced < count:
+        params = StrategyParams(*(rng.choice(space[name]) for name in fields))
+        if params.short_window < params.long_window:
+            produced += 1
+            yield params
+
+
+def run_sweep(closes, combinations, output_path, processes=None):
+    """Evaluate `combinations` in a process pool and stream the rows to `output_path`."""
+    closes = np.ascontiguousarray(closes, dtype=np.float64)
+    shm = shared_memory.SharedMemory(create=True, size=max(closes.nbytes, 1))
+    try:
+        np.ndarray(closes.shape, dtype=np.float64, buffer=shm.buf)[:] = closes
+        written = 0
+        with open(output_path, 'w') as out, \
+                Pool(processes or os.cpu_count(), initializer=_attach, initargs=(shm.name, len(closes))) as pool:
+            out.write(",".join(StrategyParams._fields + ('trades', 'accumulated_gain', 'max_drawdown')) + "\n")
+            combinations = iter(combinations)
+            while True:
+                batch = list(itertools.islice(combinations, BATCH_SIZE))
+                if not batch:
+                    break
+                for row in pool.imap_unordered(evaluate, batch, chunksize=64):
+                    out.write(",".join(str(value) for value in row) + "\n")
+                    written += 1
+        return written
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _values(text, kind):
+    return [kind(value) for value in text.split(',')]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from backtest import load_klines, load_store
+
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over the RSI + MA-crossover strategy")
+    parser.add_argument("--klines", help="JSON list of 1m klines; random-walk prices when omitted")
+    parser.add_argument("--store", help="kline store directory to read --symbol from instead")
+    parser.add_argument("--symbol", default="BTCUSDT")
+    parser.add_argument("--output", default="sweep_results.csv")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--random", type=int, help="sample this many combinations instead of the full grid")
+    parser.add_argument("--rsi-period", default="7,14,21")
+    parser.add_argument("--rsi-overbought", default="70,75,80")
+    parser.add_argument("--rsi-oversold", default="20,25,30")
+    parser.add_argument("--stop-loss", default="0.001,0.0015,0.003")
+    parser.add_argument("--take-profit", default="0.001,0.002,0.005")
+    parser.add_argument("--short-window", default="3,5,10")
+    parser.add_argument("--long-window", default="20,30,60")
+    args = parser.parse_args()
+
+    space = {name: _values(getattr(args, name), type(getattr(DEFAULT_PARAMS, name)))
+             for name in StrategyParams._fields}
+    combinations = random_search(space, args.random) if args.random else grid(space)
+
+    if args.store:
+        _, closes = load_store(args.symbol, root=args.store)
+    elif args.klines:
+        _, closes = load_klines(args.klines)
+    else:
+        rng = np.random.default_rng(0)
+        closes = 30000 * np.exp(np.cumsum(rng.normal(0, 0.0008, 30 * 24 * 60)))
+
+    started = time.perf_counter()
+    count = run_sweep(closes, combinations, args.output, args.processes)
+    print(f"{count} combinations over {len(closes)} candles in {time.perf_counter() - started:.1f}s -> {args.output}")
@@ -0,0 +1,75 @@
+"""Which tables a tick's state goes to under PERSIST_MODE.
+
+    python -m pytest test_persistence.py
+"""
+from decimal import Decimal
+
+import pytest
+
+import handler
+from handler import persistence_plan
+
+NOW = 1700000000000
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(handler, 'PERSIST_MODE', 'changes')
+    monkeypatch.setattr(handler, 'LATEST_TABLE_NAME', 'TradingStateLatest')
+    monkeypatch.setattr(handler, 'HEARTBEAT_SECONDS', 900)
+
+
+def last(position='NEUTRAL', gain='0', age_seconds=60):
+    timestamp = NOW - age_seconds * 1000
+    return {'symbol': 'BTCUSDT', 'timestamp': timestamp, 'history_timestamp': timestamp,
+            'position': position, 'accumulated_gain': gain}
+
+
+def tick(action='HOLD', position='NEUTRAL', gain='0'):
+    return {'action': action, 'position': position, 'accumulated_gain': Decimal(gain), 'price': '20000'}
+
+
+def test_first_state_goes_everywhere():
+    assert persistence_plan(None, tick(), NOW) == (True, True)
+
+
+def test_every_tick_mode_writes_both(monkeypatch):
+    monkeypatch.setattr(handler, 'PERSIST_MODE', 'every_tick')
+    assert persistence_plan(last(), tick(), NOW) == (True, True)
+
+
+def test_idle_hold_writes_nothing():
+    assert persistence_plan(last(), tick(), NOW) == (False, False)
+
+
+def test_hold_while_long_refreshes_only_the_latest_state():
+    assert persistence_plan(last('LONG'), tick(position='LONG'), NOW) == (False, True)
+
+
+def test_hold_while_long_without_latest_table_writes_history(monkeypatch):
+    monkeypatch.setattr(handler, 'LATEST_TABLE_NAME', '')
+    assert persistence_plan(last('LONG'), tick(position='LONG'), NOW) == (True, True)
+
+
+@pytest.mark.parametrize('state', [
+    tick(action='BUY', position='LONG'),
+    tick(position='LONG'),
+    tick(gain='0.5'),
+])
+def test_changes_are_history(state):
+    assert persistence_plan(last(), state, NOW) == (True, True)
+
+
+def test_gain_is_compared_as_a_number():
+    assert persistence_plan(last(gain='0.50'), tick(gain='0.5'), NOW) == (False, False)
+
+
+def test_heartbeat_writes_history():
+    assert persistence_plan(last(age_seconds=899), tick(), NOW) == (False, False)
+    assert persistence_plan(last(age_seconds=900), tick(), NOW) == (True, True)
+
+
+def test_heartbeat_counts_from_the_last_history_item():
+    state = last(age_seconds=1000)
+    state['timestamp'] = NOW - 1000  # refreshed latest state, history still old
+    assert persistence_plan(state, tick(), NOW) == (True, True)
@@ -0,0 +1,194 @@
+"""StateWriter.flush against a fake DynamoDB client.
+
+    python -m pytest test_state_writer.py
+"""
+import threading
+
+import pytest
+
+import state_writer
+from state_writer import BATCH_SIZE, CONDITION_FAILED, MAX_ATTEMPTS, StateWriter, batch_get_items
+
+
+class ConditionFailed(Exception):
+    response = {'Error': {'Code': CONDITION_FAILED, 'Message': 'The conditional request failed'}}
+
+
+class FakeClient:
+    """Enough of the DynamoDB client for StateWriter: tables as {key: item} dicts."""
+
+    def __init__(self, keys, unprocessed=0, batch_error=None):
+        self.keys = keys
+        self.tables = {name: {} for name in keys}
+        self.unprocessed = unprocessed  # items left unprocessed by each of the next calls
+        self.batch_error = batch_error
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _key(self, table_name, item):
+        return tuple(item[name] for name in self.keys[table_name])
+
+    def batch_write_item(self, RequestItems):
+        with self._lock:
+            self.calls.append(('batch_write_item', sum(map(len, RequestItems.values()))))
+            if self.batch_error is not None:
+                raise self.batch_error
+            assert sum(map(len, RequestItems.values())) <= BATCH_SIZE
+            unprocessed = {}
+            for table_name, requests in RequestItems.items():
+                for request in requests:
+                    item = request['PutRequest']['Item']
+                    if self.unprocessed:
+                        self.unprocessed -= 1
+                        unprocessed.setdefault(table_name, []).append(request)
+                    else:
+                        self.tables[table_name][self._key(table_name, item)] = item
+            return {'UnprocessedItems': unprocessed}
+
+    def put_item(self, TableName, Item, ConditionExpression, ExpressionAttributeNames,
+                 ExpressionAttributeValues=None):
+        with self._lock:
+            self.calls.append(('put_item', TableName))
+            stored = self.tables[TableName].get(self._key(TableName, Item), {})
+            name = ExpressionAttributeNames['#v']
+            if ConditionExpression == 'attribute_not_exists(#v)':
+                ok = name not in stored
+            else:
+                assert ConditionExpression == '#v = :v'
+                ok = stored.get(name) == ExpressionAttributeValues[':v']
+            if not ok:
+                raise ConditionFailed()
+            self.tables[TableName][self._key(TableName, Item)] = Item
+
+    def batch_get_item(self, RequestItems):
+        (table_name, request), = RequestItems.items()
+        items = [self.tables[table_name][self._key(table_name, key)] for key in request['Keys']
+                 if self._key(table_name, key) in self.tables[table_name]]
+        return {'Responses': {table_name: items}}
+
+
+HISTORY = {'TradingState': ('symbol', 'timestamp')}
+BOTH = dict(HISTORY, TradingStateLatest=('symbol',))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(state_writer, '_backoff', lambda attempt: None)
+
+
+def state(symbol, timestamp=1, version=None):
+    item = {'symbol': symbol, 'timestamp': timestamp, 'position': 'NEUTRAL'}
+    if version is not None:
+        item['version'] = version
+    return item
+
+
+def condition(version):
+    if version is None:
+        return 'attribute_not_exists(#v)', {'#v': 'version'}, None
+    return '#v = :v', {'#v': 'version'}, {':v': version}
+
+
+def test_writes_in_batches_of_25():
+    client = FakeClient(HISTORY)
+    writer = StateWriter(client)
+    items = [state(f"SYM{i}USDT") for i in range(60)]
+    for item in items:
+        writer.add(item)
+    assert len(writer) == 60
+
+    assert writer.flush() == [(item, None) for item in items]
+    assert sorted(n for _, n in client.calls) == [10, 25, 25]
+    assert len(client.tables['TradingState']) == 60
+    assert len(writer) == 0 and writer.flush() == []
+
+
+def test_history_and_latest_tables():
+    client = FakeClient(BOTH)
+    writer = StateWriter(client, latest_table_name='TradingStateLatest')
+    writer.add(state('BTCUSDT', 1))
+    writer.add(state('ETHUSDT', 1), tables=['TradingStateLatest'])
+
+    assert [error for _, error in writer.flush()] == [None, None]
+    assert set(client.tables['TradingState']) == {('BTCUSDT', 1)}
+    assert set(client.tables['TradingStateLatest']) == {('BTCUSDT',), ('ETHUSDT',)}
+
+
+def test_unprocessed_items_are_retried():
+    client = FakeClient(HISTORY, unprocessed=3)
+    writer = StateWriter(client)
+    for i in range(5):
+        writer.add(state(f"SYM{i}USDT"))
+
+    assert all(error is None for _, error in writer.flush())
+    assert [n for _, n in client.calls] == [5, 3]
+    assert len(client.tables['TradingState']) == 5
+
+
+def test_items_still_unprocessed_are_reported():
+    client = FakeClient(HISTORY, unprocessed=10 ** 6)
+    writer = StateWriter(client)
+    writer.add(state('BTCUSDT'))
+
+    (_, error), = writer.flush()
+    assert error == "unprocessed after %d attempts" % MAX_ATTEMPTS
+    assert len(client.calls) == MAX_ATTEMPTS
+
+
+def test_failed_call_fails_its_items():
+    client = FakeClient(HISTORY, batch_error=RuntimeError('throttled'))
+    writer = StateWriter(client)
+    writer.add(state('BTCUSDT'))
+    writer.add(state('ETHUSDT'))
+
+    assert [error for _, error in writer.flush()] == [repr(RuntimeError('throttled'))] * 2
+
+
+def test_later_item_with_the_same_key_wins():
+    client = FakeClient(HISTORY)
+    writer = StateWriter(client)
+    first, second = state('BTCUSDT'), state('BTCUSDT')
+    second['position'] = 'LONG'
+    writer.add(first)
+    writer.add(second)
+
+    assert writer.flush() == [(first, None), (second, None)]
+    assert client.tables['TradingState'][('BTCUSDT', 1)] is second
+    assert client.calls == [('batch_write_item', 1)]
+
+
+def test_conditional_latest_write_goes_first():
+    client = FakeClient(BOTH)
+    writer = StateWriter(client, latest_table_name='TradingStateLatest')
+    item = state('BTCUSDT', version=1)
+    writer.add(item, conditions={'TradingStateLatest': condition(None)})
+
+    assert writer.flush() == [(item, None)]
+    assert client.calls == [('put_item', 'TradingStateLatest'), ('batch_write_item', 1)]
+    assert client.tables['TradingStateLatest'][('BTCUSDT',)] is item
+    assert client.tables['TradingState'][('BTCUSDT', 1)] is item
+
+
+def test_failed_condition_drops_the_item_everywhere():
+    client = FakeClient(BOTH)
+    client.tables['TradingStateLatest'][('BTCUSDT',)] = state('BTCUSDT', version=3)
+    writer = StateWriter(client, latest_table_name='TradingStateLatest')
+    stale = state('BTCUSDT', 2, version=3)
+    fresh = state('ETHUSDT', 2, version=1)
+    writer.add(stale, conditions={'TradingStateLatest': condition(2)})
+    writer.add(fresh, conditions={'TradingStateLatest': condition(None)})
+
+    assert writer.flush() == [(stale, CONDITION_FAILED), (fresh, None)]
+    assert ('BTCUSDT', 2) not in client.tables['TradingState']
+    assert client.tables['TradingStateLatest'][('BTCUSDT',)]['timestamp'] == 1
+    assert client.tables['TradingState'][('ETHUSDT', 2)] is fresh
+
+
+def test_batch_get_items_skips_missing_keys():
+    client = FakeClient(BOTH)
+    writer = StateWriter(client, latest_table_name='TradingStateLatest')
+    writer.add(state('BTCUSDT'))
+    writer.flush()
+
+    items = batch_get_items(client, 'TradingStateLatest', [{'symbol': 'BTCUSDT'}, {'symbol': 'ETHUSDT'}])
+    assert [item['symbol'] for item in items] == ['BTCUSDT']
@@ -0,0 +1,92 @@
+"""Measure the cold-start cost of a Lambda handler module.
+
+Runs `python -X importtime` on the handler in a fresh interpreter, inside the
+service directory, and reports the most expensive modules by cumulative and
+self import time. It can then call init functions (for example
+`get_client,get_table`) and time each one, which separates import cost from
+client construction.
+
+    python profile_coldstart.py my-service handler --init get_client,get_table
+    python profile_coldstart.py datapipeline handler --init get_clients
+    python profile_coldstart.py dynamodbProcess dynamodbProcess --env DB_HOST=x --env DB_USER=x \\
+        --env DB_PASSWORD=x --env DB_NAME=x --env DB_TABLE_NAME=x
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Runs in the child interpreter: import the handler, then time each init function
+MARKER = '--- handler import starts ---'
+CHILD = "MARKER = %r\n" % MARKER + """
+import json, sys, time
+sys.stderr.write(MARKER + "\\n")
+sys.stderr.flush()
+started = time.perf_counter()
+__import__(sys.argv[1])  # through the C import path, so -X importtime logs the module itself
+module = sys.modules[sys.argv[1]]
+timings = {'import': time.perf_counter() - started}
+for name in filter(None, sys.argv[2].split(',')):
+    started = time.perf_counter()
+    getattr(module, name)()
+    timings[name] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+
+def parse_importtime(stderr):
+    """Rows of (module, self_us, cumulative_us, depth) from -X importtime output."""
+    rows = []
+    # Skip the interpreter's own startup imports
+    stderr = stderr.split(MARKER, 1)[-1]
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile(service_dir, module, init='', env=None):
+    child_env = dict(os.environ, **(env or {}))
+    child_env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.abspath(service_dir),
+                                                            child_env.get('PYTHONPATH')]))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, module, init],
+                            cwd=service_dir, env=child_env, capture_output=True, text=True)
+    if result.returncode:
+        raise SystemExit(result.stderr.split(MARKER, 1)[-1])
+    return parse_importtime(result.stderr), json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def outermost(rows):
+    """Imports made directly by the handler or its init functions, with everything they pulled in."""
+    return sorted(((name, cumulative_us) for name, _, cumulative_us, depth in rows if depth == 0),
+                  key=lambda item: -item[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile import and init time of a Lambda handler")
+    parser.add_argument("service_dir")
+    parser.add_argument("module")
+    parser.add_argument("--init", default="", help="comma separated functions to call and time after import")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE set for the child interpreter")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows, timings = profile(args.service_dir, args.module, args.init,
+                            dict(item.split('=', 1) for item in args.env))
+
+    print(f"{'phase':<32}{'ms':>10}")
+    for phase, seconds in timings.items():
+        print(f"{phase:<32}{seconds * 1000:>10.1f}")
+    print(f"{'total':<32}{sum(timings.values()) * 1000:>10.1f}")
+
+    print(f"\n{'outermost import':<32}{'cumulative ms':>14}")
+    for name, cumulative_us in outermost(rows)[:args.top]:
+        print(f"{name:<32}{cumulative_us / 1000:>14.1f}")
+
+    print(f"\n{'module':<48}{'self ms':>10}")
+    for name, self_us, _, _ in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"{name:<48}{self_us / 1000:>10.1f}")